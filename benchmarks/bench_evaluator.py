@@ -0,0 +1,40 @@
+"""Агрегация оценок и разбор JSON-ответов модели."""
+import json
+
+from benchmarks.fake_llm import fake_reply, install_fake_llm
+from benchmarks.harness import measure
+
+TURN_COUNTS = (10, 100, 1000, 10000)
+
+
+def synthetic_scores(count: int):
+    per_turn = []
+    for i in range(count):
+        combined = json.loads(fake_reply("evaluator", f"turn {i}"))
+        per_turn.append({"question": f"Q{i}", "answer": f"A{i}", "combined": combined, "error": None})
+    return per_turn
+
+
+def run(repeat: int = 20):
+    install_fake_llm()
+    from modules import graph
+    from modules.evaluator import MistralAnswerEvaluator, aggregate_final
+
+    results = {}
+    for count in TURN_COUNTS:
+        per_turn = synthetic_scores(count)
+        questions = [t["question"] for t in per_turn]
+        answers = [t["answer"] for t in per_turn]
+        results[f"aggregate_final_{count}"] = measure(
+            lambda: aggregate_final("Python Backend Developer", questions, answers, per_turn),
+            repeat=repeat, number=max(1, 1000 // count)
+        )
+
+    raw = fake_reply("evaluator", "parse")
+    for name, text in (("clean", raw), ("fenced", f"```json\n{raw}\n```"), ("invalid", raw[:-5])):
+        results[f"evaluator_parse_{name}"] = measure(lambda: MistralAnswerEvaluator._parse(text), repeat=repeat, number=1000)
+
+    state = graph.initial_state("Bench", "Python Backend Developer", "Middle")
+    state["last_user_input"] = "GIL не дает потокам выполнять байткод параллельно."
+    results["observer_node"] = measure(lambda: graph.observer_node(state), repeat=repeat, number=10)
+    return results
@@ -0,0 +1,50 @@
+"""Задержка хода графа интервью на локальной FakeChatModel (без сети)."""
+import time
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.harness import measure, stats
+
+ANSWERS = [
+    "GIL - это глобальная блокировка интерпретатора, она не дает потокам выполнять байткод параллельно.",
+    "asyncio работает в одном потоке на событийном цикле, потоки переключает ОС.",
+    "Я бы хранил значения вместе со временем записи и проверял TTL при чтении.",
+    "Индексы ускоряют поиск, но не помогают при низкой селективности.",
+    "Подсчет ссылок плюс циклический сборщик по поколениям.",
+]
+
+
+def play_interview(graph_module, graph, turns: int):
+    """Прогоняет интервью из turns ответов; возвращает время каждого хода (мс)."""
+    state = graph_module.initial_state("Bench", "Python Backend Developer", "Middle", total_questions=turns + 1)
+    samples = []
+    for i in range(turns + 1):
+        state["last_user_input"] = "" if i == 0 else ANSWERS[(i - 1) % len(ANSWERS)]
+        start = time.perf_counter()
+        for kind, _, payload in graph_module.stream_turn(graph, state):
+            if kind == "state":
+                state = payload
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, state
+
+
+def run(repeat: int = 5, turns: int = 10):
+    install_fake_llm()
+    from modules import graph as graph_module
+
+    graph = graph_module.build_graph()
+    results = {"build_graph": measure(graph_module.build_graph, repeat=repeat, warmup=1)}
+
+    turn_samples, interview_ms = [], []
+    for _ in range(repeat):
+        samples, _ = play_interview(graph_module, graph, turns)
+        turn_samples += samples[1:]
+        interview_ms.append(sum(samples))
+    results["turn"] = stats(turn_samples)
+    results[f"interview_{turns}_turns"] = stats(interview_ms)
+
+    bank = graph_module.get_question_bank()
+    if bank is not None:
+        results["question_bank_pick"] = measure(
+            lambda: bank.pick("Python Backend Developer", "Middle", 6, "транзакции и изоляция"), repeat=repeat * 20, warmup=1
+        )
+    return results
@@ -0,0 +1,57 @@
+"""Запись логов сессий и дисковый кэш TTS."""
+import os
+import tempfile
+
+from benchmarks.harness import measure
+
+TURN_RECORD = {
+    "question_number": 3,
+    "turn": {
+        "turn_id": 3,
+        "user_message": "Индексы ускоряют поиск, но не помогают при низкой селективности. " * 4,
+        "agent_visible_message": "4/10 Как бы вы спроектировали кэш с TTL?",
+        "internal_thoughts": "[Observer]: Ответ верный, можно усложнить. | [Vision]: Candidate is alone."
+    },
+    "scores": [{"question_number": 3, "combined": {"score": 78, "correct": True}}],
+    "difficulty": 6,
+}
+
+
+def bench_logs(results, directory, repeat):
+    from modules import utils
+
+    utils.LOG_DIR = directory
+    for fsync in (False, True):
+        session_id = f"bench-fsync-{int(fsync)}"
+        results[f"log_turn_fsync_{int(fsync)}"] = measure(
+            lambda: utils.append_record(session_id, {"type": "turn", **TURN_RECORD}, fsync=fsync),
+            repeat=repeat, number=20
+        )
+    results["load_log"] = measure(lambda: sum(1 for _ in utils.load_log("bench-fsync-0", directory)), repeat=repeat)
+
+
+def bench_tts(results, directory, repeat):
+    try:
+        from modules.audio import TTSCache, split_sentences
+    except Exception as e:
+        results["tts"] = {"skipped": f"{type(e).__name__}: {e}"}
+        return
+
+    cache = TTSCache(directory=os.path.join(directory, "tts"))
+    audio = os.urandom(32 * 1024)
+    counter = iter(range(10 ** 9))
+    results["tts_cache_put_32k"] = measure(
+        lambda: cache.put(TTSCache.key(f"фраза {next(counter)}", "ru", "bench"), audio), repeat=repeat, number=10
+    )
+    key = TTSCache.key("фраза 0", "ru", "bench")
+    results["tts_cache_get_32k"] = measure(lambda: cache.get(key), repeat=repeat, number=10)
+    report = "# Результат\n**Решение:** Hire\n\n# Анализ\n" + "Кандидат уверенно отвечал на вопросы. " * 40
+    results["split_sentences_report"] = measure(lambda: split_sentences(report), repeat=repeat, number=10)
+
+
+def run(repeat: int = 20):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        bench_logs(results, directory, repeat)
+        bench_tts(results, directory, repeat)
+    return results
@@ -0,0 +1,65 @@
+"""Холодный старт: импорт модулей и первая отрисовка run_app в свежем процессе."""
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import stats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("modules.utils", "modules.startup", "modules.agents", "modules.graph", "modules.vision", "modules.audio")
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+# AppTest прогоняет скрипт Streamlit без браузера; первый прогон в процессе - холодный
+APP_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file("run_app.py", default_timeout=60)
+app.run()
+elapsed = (time.perf_counter() - start) * 1000
+from modules import startup
+print(json.dumps({"ms": elapsed, "exception": [str(e.value) for e in app.exception], "timings": startup.timings}))
+"""
+
+WARMUP_SNIPPET = """
+import json, time
+from modules import startup
+start = time.perf_counter()
+timings = startup.warm_up()
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "timings": timings}))
+"""
+
+
+def run_fresh(code: str, timeout: float = 300) -> dict:
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["exit code %d" % proc.returncode])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_fresh(code: str, repeat: int) -> dict:
+    samples, last = [], {}
+    for _ in range(repeat):
+        last = run_fresh(code)
+        if "error" in last:
+            return {"skipped": last["error"]}
+        samples.append(last["ms"])
+    result = stats(samples)
+    result.update({k: v for k, v in last.items() if k != "ms"})
+    return result
+
+
+def run(repeat: int = 3):
+    repeat = max(1, min(repeat, 5))
+    results = {f"import_{module}": measure_fresh(IMPORT_SNIPPET.format(module=module), repeat) for module in MODULES}
+    results["run_app_first_render"] = measure_fresh(APP_SNIPPET, repeat)
+    results["warm_up"] = measure_fresh(WARMUP_SNIPPET, 1)
+    return results
@@ -0,0 +1,37 @@
+"""Пропускная способность VisionSystem на синтетических кадрах."""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.harness import Skip, measure
+
+
+def synthetic_frames(count: int = 16, height: int = 480, width: int = 640, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def run(repeat: int = 20, frames: int = 16):
+    try:
+        from modules.vision import DetectionTracker, VisionSystem, VisionWorker
+        vision = VisionSystem()
+    except Exception as e:
+        raise Skip(f"VisionSystem недоступна: {type(e).__name__}: {e}")
+
+    batch = synthetic_frames(frames)
+    results = {}
+    cursor = iter(range(10 ** 9))
+    results["analyze_frame"] = measure(lambda: vision.analyze_frame(batch[next(cursor) % frames]), repeat=repeat)
+
+    with ThreadPoolExecutor(max_workers=vision.service.max_batch) as pool:
+        per_batch = measure(lambda: list(pool.map(vision.detect, batch)), repeat=max(3, repeat // 4), warmup=1)
+    per_batch["frames_per_s"] = round(frames * 1000.0 / per_batch["mean_ms"], 2)
+    results[f"detect_concurrent_{frames}"] = per_batch
+
+    tracker = DetectionTracker()
+    detections = [("person", 0.9), ("cell phone", 0.6)]
+    results["tracker_update_summary"] = measure(
+        lambda: (tracker.update(detections), tracker.summary()), repeat=repeat, number=100
+    )
+    results["worker_frame_key"] = measure(lambda: VisionWorker.frame_key(batch[0]), repeat=repeat, number=10)
+    return results
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from modules.metrics import metrics_callback
+
+QUESTIONS = [
+    "Расскажите, как устроен GIL и когда он мешает?",
+    "Чем asyncio отличается от потоков?",
+    "Как бы вы спроектировали кэш с TTL?",
+    "Что такое индексы в PostgreSQL и когда они не помогают?",
+    "Как работает сборщик мусора в Python?",
+]
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def fake_reply(chain: str, prompt: str) -> str:
+    """Детерминированный ответ по имени цепочки: одинаковый промпт - одинаковый ответ."""
+    h = _digest(prompt)
+    if chain == "observer":
+        return json.dumps({
+            "thought_process": "Ответ частично верный, кандидат уверенно говорит о базовых вещах.",
+            "next_instruction_to_interviewer": f"Спроси: {QUESTIONS[h % len(QUESTIONS)]}",
+            "difficulty_adjustment": h % 3 - 1,
+            "status": "continue",
+            "next_action": "new_topic" if h % 2 else "follow_up",
+            "next_topic": ["asyncio", "транзакции", "кэширование", "GIL"][h % 4],
+            "findings": {
+                "strengths": [["asyncio", "структуры данных", "SQL"][h % 3]],
+                "gaps": [["GIL", "индексы", "сборка мусора"][h % 3]],
+                "flags": []
+            }
+        }, ensure_ascii=False)
+    if chain == "evaluator":
+        score = 40 + h % 56
+        return json.dumps({
+            "score": score,
+            "correct": score >= 70,
+            "mistakes": [] if score >= 70 else ["Неточность в деталях"],
+            "good_points": ["Понятное объяснение"],
+            "topics_to_repeat": [["GIL", "индексы", "asyncio"][h % 3]],
+            "short_feedback": "Неплохо, но есть что уточнить."
+        }, ensure_ascii=False)
+    if chain == "summary":
+        return "Кандидат отвечал на вопросы по Python, уверенно знает основы, путается в деталях GIL."
+    if chain == "feedback":
+        return prompt[-2000:]
+    return QUESTIONS[h % len(QUESTIONS)]
+
+
+class FakeChatModel(BaseChatModel):
+    """Локальная замена ChatMistralAI для бенчмарков и нагрузочных тестов.
+
+    Ответ зависит только от цепочки и промпта. latency_s - задержка до первого
+    токена (плюс до jitter_s, детерминированно от промпта), token_latency_s -
+    между токенами при стриминге; токены считаются грубо (~3 символа на токен)
+    и отдаются в usage_metadata, как у Mistral.
+    """
+
+    chain: str = "interviewer"
+    temperature: float = 0.0
+    latency_s: float = 0.0
+    token_latency_s: float = 0.0
+    jitter_s: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _first_token_delay(self, prompt: str) -> float:
+        return self.latency_s + self.jitter_s * (_digest(self.chain + prompt) % 1000) / 1000
+
+    def _usage(self, prompt: str, text: str):
+        prompt_tokens, completion_tokens = len(prompt) // 3 + 1, len(text) // 3 + 1
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        text = fake_reply(self.chain, prompt)
+        delay = self._first_token_delay(prompt) + self.token_latency_s * len(text.split(" "))
+        if delay:
+            time.sleep(delay)
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        text = fake_reply(self.chain, prompt)
+        delay = self._first_token_delay(prompt)
+        if delay:
+            time.sleep(delay)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if self.token_latency_s:
+                time.sleep(self.token_latency_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
+
+
+def fake_llm_factory(latency_s: float = 0.0, token_latency_s: float = 0.0, jitter_s: float = 0.0):
+    """Фабрика для modules.agents.use_llm_factory."""
+    def factory(chain_name: str, temperature: float = 0.0) -> FakeChatModel:
+        return FakeChatModel(
+            chain=chain_name,
+            latency_s=latency_s,
+            token_latency_s=token_latency_s,
+            jitter_s=jitter_s,
+            temperature=temperature,
+            cache=False,
+            callbacks=[metrics_callback],
+            metadata={"chain": chain_name}
+        )
+    return factory
+
+
+def install_fake_llm(latency_s: float = 0.0, token_latency_s: float = 0.0, jitter_s: float = 0.0):
+    """Переключает все цепочки и оценщик графа на FakeChatModel."""
+    from modules import agents, graph
+    from modules.evaluator import MistralAnswerEvaluator
+
+    factory = fake_llm_factory(latency_s, token_latency_s, jitter_s)
+    agents.use_llm_factory(factory)
+    graph.set_evaluator(MistralAnswerEvaluator(llm=factory("evaluator", 0.2)))
+    return factory
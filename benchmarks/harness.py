@@ -0,0 +1,58 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class Skip(Exception):
+    """Бенчмарк недоступен в этом окружении (нет зависимости, модели и т.п.)."""
+
+
+def stats(samples_ms: List[float]) -> Dict:
+    values = np.asarray(samples_ms, dtype=float)
+    p50, p95 = np.percentile(values, [50, 95])
+    mean = float(values.mean())
+    return {
+        "n": int(values.size),
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "min_ms": round(float(values.min()), 4),
+        "ops_per_s": round(1000.0 / mean, 2) if mean > 0 else None,
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int = 20, warmup: int = 2, number: int = 1) -> Dict:
+    """Время одного вызова fn (мс): warmup прогонов отбрасываются, каждый замер - среднее по number вызовам."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return stats(samples)
+
+
+def git_revision() -> Dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def environment() -> Dict:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        **git_revision(),
+    }
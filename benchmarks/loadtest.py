@@ -0,0 +1,225 @@
+"""Нагрузочный тест: N одновременных кандидатов на одном хосте, без сети.
+
+Каждая сессия проигрывает сценарий из fixtures (JSONL: профиль кандидата и
+ответы) через build_graph(); модель - FakeChatModel с искусственной задержкой.
+Для каждого уровня параллельности считаются пропускная способность, p50/p95/p99
+задержки хода и память на сессию (по пику RSS, с --trace-memory - еще и по
+tracemalloc, который заметно замедляет прогон); точка насыщения - уровень, после которого
+пропускная способность перестает расти или p99 выходит за SLO.
+
+    python -m benchmarks.loadtest --levels 1 4 16 64 --latency 0.4 --jitter 0.3
+"""
+import argparse
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.harness import environment
+from modules.batch import load_profiles, scripted_vision
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "candidates.jsonl")
+
+
+def simulate_candidate(graph, candidate: Dict, vision=None, tts=None, frames=None) -> Dict:
+    """Проигрывает одно интервью; возвращает задержки ходов и размер итогового состояния."""
+    from modules.graph import initial_state, stream_turn
+
+    answers = candidate["answers"]
+    script = candidate.get("vision") or []
+    state = initial_state(
+        candidate.get("participant_name", "Candidate"), candidate["position"], candidate["grade"],
+        total_questions=len(answers) + 1
+    )
+    turn_ms = []
+    for i, answer in enumerate([""] + answers):
+        state["last_user_input"] = answer
+        if vision is not None:
+            state["vision_context"] = vision.analyze_frame(frames[i % len(frames)])
+        elif i and script:
+            state["vision_context"] = scripted_vision(script[(i - 1) % len(script)])
+
+        start = time.perf_counter()
+        for kind, _, payload in stream_turn(graph, state):
+            if kind == "state":
+                state = payload
+        turn_ms.append((time.perf_counter() - start) * 1000)
+
+        if tts is not None and state.get("last_agent_message"):
+            tts.synthesize(state["last_agent_message"], "ru")
+        if state.get("final_feedback"):
+            break
+    return {
+        "turn_ms": turn_ms,
+        "finished": bool(state.get("final_feedback")),
+        "state_bytes": len(json.dumps(state, ensure_ascii=False, default=str).encode("utf-8")),
+    }
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса в байтах (Linux, /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler:
+    """Фоновый опрос RSS для оценки пика памяти во время уровня нагрузки."""
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.baseline = self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def run_level(graph, candidates: List[Dict], concurrency: int, sessions: int, **paths) -> Dict:
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        heap_baseline, _ = tracemalloc.get_traced_memory()
+
+    results, errors = [], []
+    started = time.perf_counter()
+    with RSSSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(simulate_candidate, graph, candidates[i % len(candidates)], **paths) for i in range(sessions)]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    wall_s = time.perf_counter() - started
+
+    turn_ms = np.array([ms for r in results for ms in r["turn_ms"]], dtype=float)
+    p50, p95, p99 = np.percentile(turn_ms, [50, 95, 99]) if turn_ms.size else (np.nan, np.nan, np.nan)
+    level = {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "finished": sum(r["finished"] for r in results),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "turns": int(turn_ms.size),
+        "wall_s": round(wall_s, 3),
+        "throughput_turns_per_s": round(turn_ms.size / wall_s, 2),
+        "sessions_per_min": round(len(results) * 60 / wall_s, 2),
+        "turn_p50_ms": round(float(p50), 1),
+        "turn_p95_ms": round(float(p95), 1),
+        "turn_p99_ms": round(float(p99), 1),
+        "mem_per_session_kb": round(max(rss.peak - rss.baseline, 0) / concurrency / 1024, 1),
+        "state_kb": round(float(np.mean([r["state_bytes"] for r in results])) / 1024, 1) if results else None,
+        "rss_peak_mb": round(rss.peak / 2 ** 20, 1),
+    }
+    if tracing:
+        _, heap_peak = tracemalloc.get_traced_memory()
+        level["heap_per_session_kb"] = round((heap_peak - heap_baseline) / concurrency / 1024, 1)
+    return level
+
+
+def find_saturation(levels: List[Dict], slo_p99_ms: Optional[float] = None, min_gain: float = 1.1) -> Dict:
+    """Первый уровень, где пропускная способность выросла меньше чем в min_gain раз или p99 нарушил SLO."""
+    best = None
+    for prev, cur in zip([None] + levels[:-1], levels):
+        if cur["errors"] or (slo_p99_ms is not None and cur["turn_p99_ms"] > slo_p99_ms):
+            return {"saturated_at": cur["concurrency"], "max_sustainable": best,
+                    "reason": "errors" if cur["errors"] else "p99 above SLO"}
+        if prev is not None and cur["throughput_turns_per_s"] < prev["throughput_turns_per_s"] * min_gain:
+            return {"saturated_at": cur["concurrency"], "max_sustainable": prev["concurrency"],
+                    "reason": "throughput plateau"}
+        best = cur["concurrency"]
+    return {"saturated_at": None, "max_sustainable": best, "reason": "not reached"}
+
+
+def optional_paths(use_vision: bool, use_tts: bool) -> Dict:
+    paths = {}
+    if use_vision:
+        try:
+            from benchmarks.bench_vision import synthetic_frames
+            from modules.vision import VisionSystem
+            paths.update(vision=VisionSystem(), frames=synthetic_frames(8))
+        except Exception as e:
+            print(f"Vision отключен: {type(e).__name__}: {e}")
+    if use_tts:
+        try:
+            from modules.audio import get_tts_backend
+            paths["tts"] = get_tts_backend()
+        except Exception as e:
+            print(f"TTS отключен: {type(e).__name__}: {e}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест интервью на локальной модели")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--sessions-per-worker", type=int, default=2, help="сессий на уровень = concurrency * N")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка до первого токена, с")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="задержка между токенами, с")
+    parser.add_argument("--jitter", type=float, default=0.2, help="разброс задержки, с")
+    parser.add_argument("--slo-p99-ms", type=float)
+    parser.add_argument("--min-gain", type=float, default=1.1, help="минимальный рост пропускной способности между уровнями")
+    parser.add_argument("--vision", action="store_true", help="прогонять синтетические кадры через VisionSystem")
+    parser.add_argument("--tts", action="store_true", help="синтезировать реплики интервьюера")
+    parser.add_argument("--trace-memory", action="store_true", help="учитывать Python-кучу через tracemalloc")
+    parser.add_argument("--out", help="JSON с результатами")
+    args = parser.parse_args()
+
+    install_fake_llm(args.latency, args.token_latency, args.jitter)
+    from modules.graph import build_graph
+
+    graph = build_graph()
+    candidates = load_profiles(args.fixtures)
+    paths = optional_paths(args.vision, args.tts)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    levels = []
+    for concurrency in args.levels:
+        level = run_level(graph, candidates, concurrency, concurrency * args.sessions_per_worker, **paths)
+        levels.append(level)
+        print(
+            f"c={concurrency:<4} {level['throughput_turns_per_s']:>8} turns/s  "
+            f"p50 {level['turn_p50_ms']:>8} ms  p99 {level['turn_p99_ms']:>8} ms  "
+            f"mem/session {level['mem_per_session_kb']:>8} KB  errors {level['errors']}"
+        )
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    saturation = find_saturation(levels, args.slo_p99_ms, args.min_gain)
+    print(f"Насыщение: {saturation}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "ts": time.time(),
+                "env": environment(),
+                "config": vars(args),
+                "levels": levels,
+                "saturation": saturation,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
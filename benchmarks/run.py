@@ -0,0 +1,82 @@
+"""Запуск бенчмарков и сохранение результатов в JSON.
+
+    python -m benchmarks.run                          # все наборы
+    python -m benchmarks.run --only graph evaluator   # выбранные
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import json
+import os
+import time
+import traceback
+
+from benchmarks import bench_evaluator, bench_graph, bench_io, bench_startup, bench_vision
+from benchmarks.harness import Skip, environment
+
+SUITES = {
+    "graph": bench_graph.run,
+    "vision": bench_vision.run,
+    "evaluator": bench_evaluator.run,
+    "io": bench_io.run,
+    "startup": bench_startup.run,
+}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def run_suites(names, repeat: int):
+    results = {}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            cases = SUITES[name](repeat=repeat)
+            results[name] = {"cases": cases}
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+        results[name]["elapsed_s"] = round(time.perf_counter() - started, 2)
+        print(f"{name}: {'skipped' if 'skipped' in results[name] else 'error' if 'error' in results[name] else 'ok'} "
+              f"({results[name]['elapsed_s']} s)")
+    return results
+
+
+def compare(current, baseline):
+    """Печатает изменение p50 относительно базового прогона (>1.0 - медленнее)."""
+    print(f"\nСравнение с {baseline['env'].get('commit')} (p50, мс):")
+    for suite, data in current["suites"].items():
+        old_cases = baseline["suites"].get(suite, {}).get("cases", {})
+        for case, values in data.get("cases", {}).items():
+            old = old_cases.get(case)
+            if not old or "p50_ms" not in values or "p50_ms" not in old:
+                continue
+            ratio = values["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+            mark = "  <-- медленнее" if ratio > 1.1 else ""
+            print(f"  {suite}.{case}: {old['p50_ms']:.3f} -> {values['p50_ms']:.3f} (x{ratio:.2f}){mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки компонентов интервьюера")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITES), help="какие наборы запускать")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", help="файл результатов (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    env = environment()
+    report = {"ts": time.time(), "env": env, "suites": run_suites(args.only or list(SUITES), args.repeat)}
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{env.get('commit') or 'local'}{'-dirty' if env.get('dirty') else ''}.json")
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,36 @@
-from langchain_mistralai import ChatMistralAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import os
+import threading
 from dotenv import load_dotenv
+from modules.cache import cache_for
+from modules.metrics import metrics_callback
 
 load_dotenv()
 
-api_key = os.getenv("MISTRAL_API_KEY")
-if not api_key:
-    raise ValueError("MISTRAL_API_KEY not found in .env file")
+CHAIN_NAMES = ("observer_chain", "interviewer_chain", "feedback_chain", "summary_chain")
 
-llm = ChatMistralAI(
-    model="mistral-large-latest",
-    api_key=api_key,
-    temperature=0.6
-)
+_llm_factory = None
+_chains_lock = threading.Lock()
+
+
+def make_llm(chain_name: str, temperature: float = 0.6):
+    if _llm_factory is not None:
+        return _llm_factory(chain_name, temperature)
+
+    from langchain_mistralai import ChatMistralAI
+
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        raise ValueError("MISTRAL_API_KEY not found in .env file")
+    return ChatMistralAI(
+        model="mistral-large-latest",
+        api_key=api_key,
+        temperature=temperature,
+        cache=cache_for(chain_name),
+        callbacks=[metrics_callback],
+        metadata={"chain": chain_name}
+    )
 
 observer_prompt = ChatPromptTemplate.from_template("""
 Ты - Опытный Технический Лид (Observer). 
@@ -23,7 +39,8 @@ observer_prompt = ChatPromptTemplate.from_template("""
 КОНТЕКСТ:
 Позиция: {position} ({grade})
 Сложность (1-10): {difficulty}
-История (последние 3): {history}
+Конспект предыдущих ходов: {memory_summary}
+Последний обмен репликами: {history}
 Ввод кандидата: "{last_user_input}"
 Данные с камеры: {vision_data}
 
@@ -31,13 +48,21 @@ observer_prompt = ChatPromptTemplate.from_template("""
 1. Валидация: Проверь техническую достоверность ответа. Если кандидат бредит - заметь это.
 2. Проверка поведения: Используй данные с камеры (vision_data). Если там телефон - это "Red Flag".
 3. Управление: Реши, какой вопрос задать следующим. Углубиться? Сменить тему? 
+   Новую тему можно не формулировать: вопрос подберут из банка по next_topic и сложности.
 
 ВЫВЕДИ ТОЛЬКО JSON:
 {{
   "thought_process": "Твои мысли (анализ ответа и поведения)",
   "next_instruction_to_interviewer": "Точная инструкция, что спросить или сказать",
   "difficulty_adjustment": -1 (проще), 0 (так же), 1 (сложнее),
-  "status": "continue" или "finish"
+  "status": "continue" или "finish",
+  "next_action": "follow_up" (уточнить/углубиться в текущий ответ) или "new_topic" (перейти к новой теме),
+  "next_topic": "тема следующего вопроса (для new_topic), 1-3 слова",
+  "findings": {{
+    "strengths": ["что кандидат показал хорошо в этом ответе (коротко, 2-6 слов)"],
+    "gaps": ["чего не знает или где ошибся (коротко)"],
+    "flags": ["поведенческие сигналы: списывание, уход от ответа, нечестность"]
+  }}
 }}
 """)
 
@@ -53,21 +78,58 @@ interviewer_prompt = ChatPromptTemplate.from_template("""
 """)
 
 feedback_prompt = ChatPromptTemplate.from_template("""
-Составь финальный отчет по интервью для {position}.
-Мысли Ментора за все время:
-{all_observer_thoughts}
-
-Формат Markdown:
-# Результат
-**Грейд:** ...
-**Решение:** ... (Hire/No Hire)
-
-# Анализ
-* Hard Skills: (что знает, что нет)
-* Soft Skills & Поведение: (честность, списывал ли)
-* Рекомендации: ...
+Отредактируй черновик финального отчета по интервью для {position}.
+Конспект интервью:
+{memory_summary}
+
+Черновик:
+{draft_report}
+
+Сохрани структуру Markdown, решение и баллы из черновика. Убери повторы и
+сформулируй выводы по Hard Skills и Soft Skills связно и кратко. Ничего не выдумывай.
+""")
+
+summary_prompt = ChatPromptTemplate.from_template("""
+Ты ведешь краткий конспект технического интервью на {position} ({grade}).
+
+Текущий конспект:
+{memory_summary}
+
+Новый ход:
+Вопрос: {question}
+Ответ кандидата: {answer}
+Заметка Ментора по этому ответу: {observer_thought}
+
+Обнови конспект: сохрани важное из прошлого (пройденные темы, уровень знаний,
+ошибки, красные флаги поведения) и добавь новое. Не более {max_words} слов.
+Выведи только текст конспекта.
 """)
 
-observer_chain = observer_prompt | llm | StrOutputParser()
-interviewer_chain = interviewer_prompt | llm | StrOutputParser()
-feedback_chain = feedback_prompt | llm | StrOutputParser()
\ No newline at end of file
+def build_chains():
+    """Собирает цепочки; вызывается при первом обращении к любой из них."""
+    global observer_chain, interviewer_chain, feedback_chain, summary_chain
+    observer_chain = observer_prompt | make_llm("observer") | StrOutputParser()
+    interviewer_chain = interviewer_prompt | make_llm("interviewer") | StrOutputParser()
+    feedback_chain = feedback_prompt | make_llm("feedback") | StrOutputParser()
+    summary_chain = summary_prompt | make_llm("summary", temperature=0.2) | StrOutputParser()
+
+
+def use_llm_factory(factory):
+    """Подменяет модель всех цепочек: factory(chain_name, temperature) -> chat model.
+
+    None возвращает ChatMistralAI. Используется бенчмарками с локальной моделью.
+    """
+    global _llm_factory
+    with _chains_lock:
+        _llm_factory = factory
+        build_chains()
+
+
+def __getattr__(name):
+    # Клиент Mistral создается лениво: импорт модуля не требует ключа и не тянет langchain_mistralai
+    if name in CHAIN_NAMES:
+        with _chains_lock:
+            if name not in globals():
+                build_chains()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
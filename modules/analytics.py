@@ -0,0 +1,253 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.evaluator import is_scored, score_summary, verdict_for
+from modules.utils import LOG_DIR, load_log
+
+ANALYTICS_DB = os.getenv("ANALYTICS_DB", os.path.join(".cache", "analytics.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    participant_name TEXT,
+    position TEXT,
+    grade TEXT,
+    started_at REAL,
+    finished_at REAL,
+    verdict TEXT,
+    overall_score REAL,
+    correct_percent REAL,
+    source_mtime REAL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    question_number INTEGER,
+    ts REAL,
+    difficulty INTEGER,
+    user_message TEXT,
+    agent_message TEXT,
+    internal_thoughts TEXT
+);
+CREATE TABLE IF NOT EXISTS scores (
+    session_id TEXT NOT NULL,
+    question_number INTEGER,
+    score REAL,
+    correct INTEGER
+);
+CREATE TABLE IF NOT EXISTS vision_alerts (
+    session_id TEXT NOT NULL,
+    question_number INTEGER,
+    ts REAL,
+    alert TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_position ON sessions(position);
+CREATE INDEX IF NOT EXISTS idx_sessions_grade ON sessions(grade);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_verdict ON sessions(verdict);
+CREATE INDEX IF NOT EXISTS idx_turns_session ON turns(session_id);
+CREATE INDEX IF NOT EXISTS idx_scores_session ON scores(session_id);
+CREATE INDEX IF NOT EXISTS idx_alerts_session ON vision_alerts(session_id);
+"""
+
+GROUP_COLUMNS = ("position", "grade", "verdict")
+
+
+def vision_alerts(vision_context) -> List[str]:
+    if isinstance(vision_context, dict):
+        return list(vision_context.get("alerts", []))
+    if isinstance(vision_context, str):
+        return [part.strip() for part in vision_context.split("|") if "ALERT" in part]
+    return []
+
+
+class AnalyticsStore:
+    """SQLite-хранилище истории интервью для когортной аналитики.
+
+    Наполняется из JSONL-логов сессий (modules.utils); агрегаты считаются
+    векторно в NumPy поверх индексированной выборки.
+    """
+
+    def __init__(self, path: str = ANALYTICS_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def ingest_session(self, session_id: str, log_dir: Optional[str] = None, source_mtime: Optional[float] = None) -> bool:
+        session = {"session_id": session_id}
+        turns, scores, alerts = [], [], []
+        correct_threshold = 70
+
+        for record in load_log(session_id, log_dir):
+            kind = record.get("type")
+            if kind == "session":
+                session.update(
+                    participant_name=record.get("participant_name"),
+                    position=record.get("position"),
+                    grade=record.get("grade"),
+                    started_at=record.get("ts")
+                )
+            elif kind == "turn":
+                qn = record.get("question_number")
+                turn = record.get("turn") or {}
+                turns.append((
+                    session_id, qn, record.get("ts"), record.get("difficulty"),
+                    turn.get("user_message"), turn.get("agent_visible_message"), turn.get("internal_thoughts")
+                ))
+                for entry in filter(is_scored, record.get("scores", [])):
+                    score = float(entry.get("combined", {}).get("score", 0) or 0)
+                    scores.append((session_id, entry.get("question_number", qn), score, int(score >= correct_threshold)))
+                for alert in vision_alerts(record.get("vision_context")):
+                    alerts.append((session_id, qn, record.get("ts"), alert))
+            elif kind == "final":
+                report = record.get("final_report") or {}
+                session.update(
+                    finished_at=record.get("ts"),
+                    verdict=report.get("verdict"),
+                    overall_score=report.get("overall_score"),
+                    correct_percent=report.get("correct_percent")
+                )
+
+        if "position" not in session:
+            return False
+
+        with self._lock, self._conn:
+            for table in ("sessions", "turns", "scores", "vision_alerts"):
+                self._conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, participant_name, position, grade, started_at, finished_at, "
+                "verdict, overall_score, correct_percent, source_mtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    session_id, session.get("participant_name"), session.get("position"), session.get("grade"),
+                    session.get("started_at"), session.get("finished_at"), session.get("verdict"),
+                    session.get("overall_score"), session.get("correct_percent"), source_mtime
+                )
+            )
+            self._conn.executemany("INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?)", turns)
+            self._conn.executemany("INSERT INTO scores VALUES (?, ?, ?, ?)", scores)
+            self._conn.executemany("INSERT INTO vision_alerts VALUES (?, ?, ?, ?)", alerts)
+        return True
+
+    def ingest_logs(self, log_dir: Optional[str] = None) -> int:
+        """Загружает новые и изменившиеся логи сессий; возвращает число загруженных."""
+        with self._lock:
+            known = dict(self._conn.execute("SELECT session_id, source_mtime FROM sessions").fetchall())
+
+        ingested = 0
+        log_dir = log_dir or LOG_DIR
+        for path in glob.glob(os.path.join(log_dir, "*.jsonl")):
+            session_id = os.path.basename(path)[:-len(".jsonl")]
+            mtime = os.path.getmtime(path)
+            if known.get(session_id) == mtime:
+                continue
+            if self.ingest_session(session_id, log_dir, source_mtime=mtime):
+                ingested += 1
+        return ingested
+
+    def _where(self, position=None, grade=None, verdict=None, since=None, until=None):
+        clauses, params = [], []
+        for column, value in (("position", position), ("grade", grade), ("verdict", verdict)):
+            if value is not None:
+                clauses.append(f"s.{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("s.started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.started_at < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def cohort_stats(self, group_by: str = "position", correct_threshold: int = 70, bins: int = 10, **filters) -> Dict:
+        """Статистика баллов по когортам (position/grade/verdict) с фильтрами.
+
+        Для каждой когорты: число сессий и ответов, средний балл и доля правильных
+        (как в aggregate_final), перцентили, гистограмма баллов, доля Hire и алертов.
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {GROUP_COLUMNS}")
+        where, params = self._where(**filters)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT s.{group_by}, sc.session_id, sc.score FROM scores sc "
+                f"JOIN sessions s ON s.session_id = sc.session_id{where}",
+                params
+            ).fetchall()
+            session_rows = self._conn.execute(
+                f"SELECT s.{group_by}, s.session_id, s.verdict, "
+                f"(SELECT COUNT(*) FROM vision_alerts va WHERE va.session_id = s.session_id) "
+                f"FROM sessions s{where}",
+                params
+            ).fetchall()
+
+        result = {}
+        if rows:
+            groups = np.array([str(r[0]) for r in rows])
+            scores = np.array([r[2] for r in rows], dtype=float)
+            keys, inverse = np.unique(groups, return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+            for key, group_scores in zip(keys, np.split(scores[order], bounds)):
+                summary = score_summary(group_scores, correct_threshold)
+                hist, edges = np.histogram(group_scores, bins=bins, range=(0, 100))
+                p25, p50, p75, p90 = np.percentile(group_scores, [25, 50, 75, 90])
+                result[str(key)] = {
+                    "answers": summary["count"],
+                    "avg_score": round(summary["avg"], 1),
+                    "correct_percent": round(summary["correct_percent"], 1),
+                    "verdict_by_avg": verdict_for(summary["avg"], summary["correct_percent"]),
+                    "p25": float(p25), "p50": float(p50), "p75": float(p75), "p90": float(p90),
+                    "histogram": {"counts": hist.tolist(), "edges": edges.tolist()}
+                }
+
+        if session_rows:
+            groups = np.array([str(r[0]) for r in session_rows])
+            hired = np.array([r[2] == "Hire" for r in session_rows], dtype=float)
+            alerted = np.array([r[3] > 0 for r in session_rows], dtype=float)
+            keys, inverse = np.unique(groups, return_inverse=True)
+            counts = np.bincount(inverse)
+            hire_rate = np.bincount(inverse, weights=hired) / counts
+            alert_rate = np.bincount(inverse, weights=alerted) / counts
+            for i, key in enumerate(keys):
+                entry = result.setdefault(str(key), {"answers": 0})
+                entry["sessions"] = int(counts[i])
+                entry["hire_rate"] = round(float(hire_rate[i]), 3)
+                entry["alert_rate"] = round(float(alert_rate[i]), 3)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Аналитика по истории интервью")
+    parser.add_argument("--db", default=ANALYTICS_DB)
+    parser.add_argument("--logs", default=LOG_DIR)
+    parser.add_argument("--by", default="position", choices=GROUP_COLUMNS)
+    parser.add_argument("--position")
+    parser.add_argument("--grade")
+    parser.add_argument("--days", type=float, help="только сессии за последние N дней")
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.db)
+    print(f"Загружено сессий: {store.ingest_logs(args.logs)}")
+    since = time.time() - args.days * 86400 if args.days else None
+    stats = store.cohort_stats(group_by=args.by, position=args.position, grade=args.grade, since=since)
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,643 @@
 import speech_recognition as sr
 from gtts import gTTS
+import numpy as np
 import base64
+import hashlib
 import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 import streamlit as st
 
+from modules.metrics import get_metrics, span
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(".cache", "tts"))
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_BACKEND = os.getenv("TTS_BACKEND", "auto")
+ASR_BACKEND = os.getenv("ASR_BACKEND", "google")
+ASR_VOSK_MODEL = os.getenv("ASR_VOSK_MODEL", os.path.join("models", "vosk-model-small-ru"))
+ASR_WHISPER_MODEL = os.getenv("ASR_WHISPER_MODEL", "base")
+MIC_CALIBRATION_PATH = os.getenv("MIC_CALIBRATION_PATH", os.path.join(".cache", "mic_calibration.json"))
+MIC_CALIBRATION_TTL = float(os.getenv("MIC_CALIBRATION_TTL", str(24 * 3600)))
+MIC_DRIFT_RATIO = 1.5
+MIC_NOISE_PERCENTILE = 20
+
+MARKDOWN_RE = re.compile(r"[#*_`>|]+")
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+# Фрагмент плейлиста: каждый фрагмент - отдельный скрытый iframe; очередь
+# передается через localStorage (номер фрагмента, который играет следующим),
+# поэтому фрагмент, отрисованный позже окончания предыдущего, стартует сразу.
+PLAYLIST_CHUNK_HTML = """
+<audio id="chunk" src="data:{mime};base64,{b64}"></audio>
+<script>
+const key = "tts-playlist-{playlist}", index = {index};
+const audio = document.getElementById("chunk");
+let started = false;
+function tryPlay() {{
+  if (!started && Number(localStorage.getItem(key) || 0) === index) {{
+    started = true;
+    audio.play().catch(() => localStorage.setItem(key, index + 1));
+  }}
+}}
+audio.onended = () => localStorage.setItem(key, index + 1);
+window.addEventListener("storage", (e) => {{ if (e.key === key) tryPlay(); }});
+tryPlay();
+</script>
+"""
+
+
+def split_sentences(text: str, max_chars: int = 300) -> List[str]:
+    """Режет текст (в т.ч. Markdown-отчет) на предложения для синтеза по частям."""
+    chunks = []
+    for part in SENTENCE_RE.split(MARKDOWN_RE.sub(" ", text)):
+        part = " ".join(part.split())
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(part[:cut])
+            part = part[cut:].strip()
+        if part:
+            chunks.append(part)
+    return [c for c in chunks if any(ch.isalnum() for ch in c)]
+
+
+class TTSCache:
+    """Дисковый LRU-кэш синтезированного аудио с ограничением по размеру.
+
+    Ключ - хэш (движок, язык, текст); порядок вытеснения - по времени последнего чтения.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = [e for e in os.scandir(directory) if e.is_file() and e.name.endswith(".tts")]
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            self._index[entry.name[:-4]] = entry.stat().st_size
+        self.total_bytes = sum(self._index.values())
+
+    @staticmethod
+    def key(text: str, lang: str, engine: str) -> str:
+        return hashlib.sha256(f"{engine}\x00{lang}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.tts")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                self.total_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self.total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+
+class GTTSBackend:
+    name = "gtts"
+    audio_format = "audio/mp3"
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        tts = gTTS(text=text, lang=lang, slow=False)
+        audio_buffer = io.BytesIO()
+        tts.write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
+
+class Pyttsx3Backend:
+    """Локальный офлайн-синтез через pyttsx3 (espeak/SAPI5/NSSpeech).
+
+    Движок pyttsx3 не потокобезопасен, поэтому вызовы сериализуются.
+    """
+    name = "pyttsx3"
+    audio_format = "audio/wav"
+
+    def __init__(self, rate: Optional[int] = None):
+        import pyttsx3
+        self._lock = threading.Lock()
+        self._engine = pyttsx3.init()
+        if rate:
+            self._engine.setProperty("rate", rate)
+        self._voices = {}
+
+    def _voice_for(self, lang: str) -> Optional[str]:
+        if lang not in self._voices:
+            self._voices[lang] = None
+            for voice in self._engine.getProperty("voices"):
+                langs = [l.decode(errors="ignore") if isinstance(l, bytes) else str(l) for l in (voice.languages or [])]
+                voice_id = voice.id.lower()
+                if any(lang in l for l in langs) or lang in voice_id or (lang == "ru" and "russian" in voice_id):
+                    self._voices[lang] = voice.id
+                    break
+        return self._voices[lang]
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        with self._lock:
+            voice = self._voice_for(lang)
+            if voice:
+                self._engine.setProperty("voice", voice)
+            fd, path = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
+            try:
+                self._engine.save_to_file(text, path)
+                self._engine.runAndWait()
+                with open(path, "rb") as f:
+                    return f.read()
+            finally:
+                os.remove(path)
+
+
+_tts_cache: Optional[TTSCache] = None
+_tts_pool: Optional[ThreadPoolExecutor] = None
+_tts_backends = {}
+_tts_lock = threading.Lock()
+# Синтезы в процессе: ключ кэша -> Future, чтобы один текст не синтезировался дважды
+_tts_inflight: Dict[str, Future] = {}
+_tts_inflight_lock = threading.Lock()
+
+
+def get_tts_backend(name: str = TTS_BACKEND):
+    """Общий на процесс движок TTS: "pyttsx3", "gtts" или "auto" (pyttsx3, иначе gTTS)."""
+    with _tts_lock:
+        if name not in _tts_backends:
+            if name == "gtts":
+                _tts_backends[name] = GTTSBackend()
+            elif name == "pyttsx3":
+                _tts_backends[name] = Pyttsx3Backend()
+            elif name == "auto":
+                try:
+                    _tts_backends[name] = Pyttsx3Backend()
+                except Exception as e:
+                    print(f"pyttsx3 unavailable, falling back to gTTS: {e}")
+                    _tts_backends[name] = GTTSBackend()
+            else:
+                raise ValueError(f"Unknown TTS backend: {name}")
+        return _tts_backends[name]
+
+
+def get_tts_cache() -> TTSCache:
+    global _tts_cache
+    with _tts_lock:
+        if _tts_cache is None:
+            _tts_cache = TTSCache()
+        return _tts_cache
+
+
+def get_tts_pool() -> ThreadPoolExecutor:
+    global _tts_pool
+    with _tts_lock:
+        if _tts_pool is None:
+            _tts_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+        return _tts_pool
+
+
+class GoogleRecognizer:
+    name = "google"
+
+    def __init__(self, language: str = "ru-RU"):
+        self.language = language
+        self._recognizer = sr.Recognizer()
+
+    def transcribe(self, audio_data) -> Optional[str]:
+        try:
+            return self._recognizer.recognize_google(audio_data, language=self.language)
+        except sr.UnknownValueError:
+            return None
+
+
+class VoskRecognizer:
+    """Офлайн-распознавание на CPU через Vosk (pip install vosk + русская модель)."""
+    name = "vosk"
+
+    def __init__(self, model_path: str = ASR_VOSK_MODEL):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def transcribe(self, audio_data) -> Optional[str]:
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, 16000)
+        recognizer.AcceptWaveform(audio_data.get_raw_data(convert_rate=16000, convert_width=2))
+        return json.loads(recognizer.FinalResult()).get("text") or None
+
+
+class WhisperRecognizer:
+    """Офлайн-распознавание на CPU через openai-whisper (pip install openai-whisper)."""
+    name = "whisper"
+
+    def __init__(self, model_name: str = ASR_WHISPER_MODEL, language: str = "ru"):
+        import whisper
+        self.language = language
+        self.model = whisper.load_model(model_name, device="cpu")
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio_data) -> Optional[str]:
+        raw = audio_data.get_raw_data(convert_rate=16000, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        with self._lock:
+            result = self.model.transcribe(samples, language=self.language, fp16=False)
+        return result.get("text", "").strip() or None
+
+
+_asr_backends = {}
+_asr_lock = threading.Lock()
+
+
+def get_speech_recognizer(name: str = ASR_BACKEND):
+    """Общий на процесс распознаватель: модель офлайн-движка грузится один раз."""
+    with _asr_lock:
+        if name not in _asr_backends:
+            if name == "google":
+                _asr_backends[name] = GoogleRecognizer()
+            elif name == "vosk":
+                _asr_backends[name] = VoskRecognizer()
+            elif name == "whisper":
+                _asr_backends[name] = WhisperRecognizer()
+            else:
+                raise ValueError(f"Unknown ASR backend: {name}")
+        return _asr_backends[name]
+
+
+class CalibrationStore:
+    """Порог энергии микрофона по устройствам, хранится в JSON-файле с TTL."""
+
+    def __init__(self, path: str = MIC_CALIBRATION_PATH, ttl: float = MIC_CALIBRATION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, device: str) -> Optional[float]:
+        with self._lock:
+            entry = self._load().get(device)
+        if not entry or time.time() - entry.get("ts", 0) > self.ttl:
+            return None
+        return entry.get("energy_threshold")
+
+    def put(self, device: str, energy_threshold: float):
+        with self._lock:
+            data = self._load()
+            data[device] = {"energy_threshold": energy_threshold, "ts": time.time()}
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+
+
+def mic_device_key(device_index: Optional[int] = None) -> str:
+    try:
+        names = sr.Microphone.list_microphone_names()
+        if device_index is not None and device_index < len(names):
+            return f"{device_index}:{names[device_index]}"
+    except Exception:
+        pass
+    return "default" if device_index is None else str(device_index)
+
+
+class MicCapture:
+    """Фоновая запись с микрофона с простым энергетическим VAD.
+
+    Поток читает микрофон кусками по chunk_ms, режет речь на фразы по паузам
+    (silence_ms) и отправляет каждую закрытую фразу на распознавание, не дожидаясь
+    конца ответа. Запись завершается сама после idle_stop_s тишины после речи
+    или через max_duration_s.
+    """
+
+    def __init__(self, recognize, energy_threshold: float = 300.0, chunk_ms: int = 30,
+                 silence_ms: int = 700, preroll_ms: int = 300, max_segment_s: float = 15.0,
+                 idle_stop_s: float = 3.0, max_duration_s: float = 45.0,
+                 source=None, source_lock=None, on_noise_floor=None):
+        self.recognize = recognize
+        self.source = source
+        self.source_lock = source_lock or threading.Lock()
+        self.on_noise_floor = on_noise_floor
+        self.noise_floor: Optional[float] = None
+        self.energy_threshold = energy_threshold
+        self.chunk_ms = chunk_ms
+        self.silence_ms = silence_ms
+        self.preroll_ms = preroll_ms
+        self.max_segment_s = max_segment_s
+        self.idle_stop_s = idle_stop_s
+        self.max_duration_s = max_duration_s
+        self.error: Optional[str] = None
+
+        self._stop = threading.Event()
+        self._futures = []
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="asr")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "MicCapture":
+        self._thread.start()
+        return self
+
+    @property
+    def active(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    @property
+    def transcript(self) -> str:
+        parts = [f.result() for f in list(self._futures) if f.done() and not f.exception()]
+        return " ".join(p for p in parts if p)
+
+    def stop(self):
+        self._stop.set()
+
+    def finish(self, timeout: float = 30.0) -> str:
+        """Останавливает запись и дожидается распознавания всех фраз."""
+        self.stop()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        for future in list(self._futures):
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                print(f"Ошибка распознавания фразы: {e}")
+        self._pool.shutdown(wait=False)
+        return self.transcript
+
+    @staticmethod
+    def energy(buf: bytes) -> float:
+        samples = np.frombuffer(buf, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples ** 2))) if samples.size else 0.0
+
+    def _close_segment(self, segment, sample_rate, sample_width):
+        audio = sr.AudioData(b"".join(segment), sample_rate, sample_width)
+        self._futures.append(self._pool.submit(self.recognize, audio))
+
+    def _run(self):
+        try:
+            if self.source is not None:
+                with self.source_lock:
+                    self._capture(self.source)
+            else:
+                with sr.Microphone() as source:
+                    self._capture(source)
+            if self.on_noise_floor and self.noise_floor:
+                self.on_noise_floor(self.noise_floor)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ошибка микрофона: {e}")
+
+    def _capture(self, source):
+        rate, width = source.SAMPLE_RATE, source.SAMPLE_WIDTH
+        chunk = max(1, int(rate * self.chunk_ms / 1000))
+        chunk_s = chunk / rate
+        preroll = deque(maxlen=max(1, int(self.preroll_ms / self.chunk_ms)))
+        silence_chunks = max(1, int(self.silence_ms / self.chunk_ms))
+        max_segment_chunks = int(self.max_segment_s / chunk_s)
+
+        segment = []
+        silent = 0
+        elapsed = 0.0
+        last_speech = None
+        energies = []
+
+        while not self._stop.is_set():
+            if elapsed > self.max_duration_s:
+                break
+            if not segment and last_speech is not None and elapsed - last_speech > self.idle_stop_s:
+                break
+
+            buf = source.stream.read(chunk)
+            elapsed += chunk_s
+            energy = self.energy(buf)
+            energies.append(energy)
+            loud = energy >= self.energy_threshold
+            if loud:
+                last_speech = elapsed
+
+            if segment:
+                segment.append(buf)
+                silent = 0 if loud else silent + 1
+                if silent >= silence_chunks or len(segment) >= max_segment_chunks:
+                    self._close_segment(segment, rate, width)
+                    segment = []
+                    silent = 0
+            elif loud:
+                segment = list(preroll) + [buf]
+                preroll.clear()
+            else:
+                preroll.append(buf)
+
+        if segment:
+            self._close_segment(segment, rate, width)
+        if energies:
+            # Шум - нижний перцентиль всех кусков, а не только тихих: иначе он всегда ниже
+            # порога и выросший фон в комнате не обнаружить
+            self.noise_floor = float(np.percentile(energies, MIC_NOISE_PERCENTILE))
+        self._stop.set()
+
+
 class AudioSystem:
-    def __init__(self):
+    def __init__(self, tts_backend=None, asr_backend=None):
+        self.tts = tts_backend or get_tts_backend()
+        self.asr = asr_backend or get_speech_recognizer()
+        self.tts_cache = get_tts_cache()
         self.recognizer = sr.Recognizer()
+        self.calibration = CalibrationStore()
+        self.device_key = mic_device_key()
+        self._mic_state = {"mic": None, "source": None}
+        self._source_lock = threading.Lock()
+        # Сессия Streamlit закончилась и AudioSystem собран сборщиком мусора - освобождаем микрофон
+        weakref.finalize(self, AudioSystem._release, self._mic_state)
+
+        threshold = self.calibration.get(self.device_key)
+        if threshold:
+            self.recognizer.energy_threshold = threshold
+        else:
+            threading.Thread(target=self.calibrate, daemon=True).start()
+
+    def open_source(self):
+        """Открывает поток микрофона один раз на сессию и переиспользует его."""
+        if self._mic_state["source"] is None:
+            mic = sr.Microphone()
+            self._mic_state["source"] = mic.__enter__()
+            self._mic_state["mic"] = mic
+        return self._mic_state["source"]
+
+    @staticmethod
+    def _release(mic_state: dict):
+        mic = mic_state["mic"]
+        mic_state["mic"] = mic_state["source"] = None
+        if mic is not None:
+            try:
+                mic.__exit__(None, None, None)
+            except Exception as e:
+                print(f"Microphone close warning: {e}")
+
+    def close(self):
+        """Освобождает поток микрофона; следующая запись откроет его заново."""
+        with self._source_lock:
+            self._release(self._mic_state)
+
+    def calibrate(self, duration: float = 0.5):
         try:
-            with sr.Microphone() as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            with self._source_lock:
+                opened = self._mic_state["source"] is None
+                self.recognizer.adjust_for_ambient_noise(self.open_source(), duration=duration)
+                if opened:
+                    # Калибровка в фоне не должна держать микрофон до первой записи
+                    self._release(self._mic_state)
+            self.calibration.put(self.device_key, self.recognizer.energy_threshold)
         except Exception as e:
             print(f"Microphone init warning: {e}")
 
+    def check_drift(self, noise_floor: float):
+        """Пересчитывает порог по шуму, замеренному во время записи.
+
+        Порог ниже шума с запасом dynamic_energy_ratio поднимается сразу (иначе VAD
+        принимает фон за речь), а опускается только при заметном уходе (MIC_DRIFT_RATIO).
+        """
+        expected = noise_floor * self.recognizer.dynamic_energy_ratio
+        current = self.recognizer.energy_threshold
+        if expected > current or expected * MIC_DRIFT_RATIO < current:
+            self.recognizer.energy_threshold = expected
+            self.calibration.put(self.device_key, expected)
+
     def listen_from_mic(self, timeout=5, phrase_time_limit=10):
         try:
-            with sr.Microphone() as source:
+            with self._source_lock:
                 print("Слушаю...")
                 audio_data = self.recognizer.listen(
-                    source, 
+                    self.open_source(), 
                     timeout=timeout, 
                     phrase_time_limit=phrase_time_limit
                 )
-                print("Распознаю...")
-                text = self.recognizer.recognize_google(audio_data, language="ru-RU")
-                return text
+            print("Распознаю...")
+            return self.recognize(audio_data)
         except sr.WaitTimeoutError:
             return None
-        except sr.UnknownValueError:
+        except Exception as e:
+            print(f"Ошибка микрофона: {e}")
             return None
+
+    def recognize(self, audio_data) -> Optional[str]:
+        return self.asr.transcribe(audio_data)
+
+    def transcribe_file(self, path: str) -> Optional[str]:
+        """Распознает WAV/AIFF/FLAC-файл - удобно для проверки без микрофона."""
+        with sr.AudioFile(path) as source:
+            audio_data = self.recognizer.record(source)
+        return self.recognize(audio_data)
+
+    def start_capture(self, max_duration_s: float = 45.0) -> MicCapture:
+        try:
+            source = self.open_source()
         except Exception as e:
             print(f"Ошибка микрофона: {e}")
+            source = None
+        return MicCapture(
+            self.recognize,
+            energy_threshold=self.recognizer.energy_threshold,
+            max_duration_s=max_duration_s,
+            source=source,
+            source_lock=self._source_lock,
+            on_noise_floor=self.check_drift
+        ).start()
+
+    def synthesize(self, text, lang='ru') -> bytes:
+        key = TTSCache.key(text, lang, self.tts.name)
+        audio_bytes = self.tts_cache.get(key)
+        get_metrics().observe("tts.cache_hit", 0.0 if audio_bytes is None else 1.0)
+        if audio_bytes is not None:
+            return audio_bytes
+
+        with _tts_inflight_lock:
+            future = _tts_inflight.get(key)
+            owner = future is None
+            if owner:
+                future = _tts_inflight[key] = Future()
+        if not owner:
+            # Тот же текст уже синтезируется (например, presynthesize) - ждем его
+            return future.result()
+
+        try:
+            # Синтез мог завершиться между первой проверкой кэша и регистрацией
+            audio_bytes = self.tts_cache.get(key)
+            if audio_bytes is None:
+                with span(f"tts.{self.tts.name}"):
+                    audio_bytes = self.tts.synthesize(text, lang)
+                self.tts_cache.put(key, audio_bytes)
+            future.set_result(audio_bytes)
+            return audio_bytes
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _tts_inflight_lock:
+                _tts_inflight.pop(key, None)
+
+    def presynthesize(self, text, lang='ru'):
+        """Синтезирует текст в фоне; synthesize() того же текста дождется этого синтеза, а не запустит второй."""
+        if not text:
             return None
+        future = get_tts_pool().submit(self.synthesize, text, lang)
+        future.add_done_callback(lambda f: f.exception() and print(f"TTS presynthesis error: {f.exception()}"))
+        return future
+
+    def synthesize_stream(self, text, lang='ru') -> Iterator[bytes]:
+        """Синтезирует предложения параллельно и отдает аудио по порядку по мере готовности."""
+        pool = get_tts_pool()
+        futures = [pool.submit(self.synthesize, chunk, lang) for chunk in split_sentences(text)]
+        for future in futures:
+            yield future.result()
 
     def text_to_speech_base64(self, text, lang='ru'):
         if not text:
             return None, 0
         
         try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            
-            audio_bytes = audio_buffer.read()
+            audio_bytes = self.synthesize(text, lang)
             b64 = base64.b64encode(audio_bytes).decode()
             return b64, len(audio_bytes)
         except Exception as e:
@@ -55,12 +649,25 @@ class AudioSystem:
             return
         
         try:
-            tts = gTTS(text=text, lang='ru', slow=False)
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            
-            st.audio(audio_buffer, format="audio/mp3")
+            st.audio(self.synthesize(text, 'ru'), format=self.tts.audio_format)
+        except Exception as e:
+            st.error(f"Ошибка воспроизведения: {e}")
+
+    def play_long_text_streamlit(self, text):
+        """Озвучивает длинный текст без пауз: первое предложение играет сразу, остальные встают в очередь по мере синтеза."""
+        if not text:
+            return
+
+        import uuid
+        import streamlit.components.v1 as components
+
+        playlist = uuid.uuid4().hex
+        try:
+            for i, audio_bytes in enumerate(self.synthesize_stream(text, 'ru')):
+                components.html(PLAYLIST_CHUNK_HTML.format(
+                    mime=self.tts.audio_format, b64=base64.b64encode(audio_bytes).decode(),
+                    playlist=playlist, index=i
+                ), height=0)
         except Exception as e:
             st.error(f"Ошибка воспроизведения: {e}")
 
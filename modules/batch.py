@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.evaluator import is_scored, score_summary
+from modules.utils import LOG_DIR, log_session_start, log_turn, new_session_id, save_log, turn_record
+
+SCRIPTED_VISION = {
+    "alone": ("Candidate is alone.", []),
+    "phone": ("ALERT: Mobile phone detected!", ["phone"]),
+    "absent": ("ALERT: Candidate left the frame!", ["absent"]),
+}
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def load_profiles(path: str) -> List[Dict]:
+    """Сценарии кандидатов: JSONL (по профилю на строку) или JSON-список.
+
+    Профиль: participant_name, position, grade, answers[, candidate_id,
+    total_questions, vision (события камеры по ходам), expected_verdict].
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def scripted_vision(label: str) -> Dict:
+    text, alerts = SCRIPTED_VISION.get(label, SCRIPTED_VISION["alone"])
+    return {"text": text, "alerts": alerts, "frames": 1, "window_s": 60.0, "classes": {}}
+
+
+def get_graph():
+    """Граф на процесс: в режиме потоков общий, в режиме процессов - свой в каждом."""
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            from modules.graph import build_graph
+            _graph = build_graph()
+        return _graph
+
+
+def run_interview(profile: Dict, log_dir: Optional[str] = None, report_dir: Optional[str] = None) -> Dict:
+    """Проигрывает сценарий кандидата через граф, пишет лог сессии и Markdown-отчет."""
+    from modules.graph import feedback_node, initial_state, stream_turn
+
+    answers = profile["answers"]
+    candidate_id = profile.get("candidate_id") or profile.get("participant_name", "candidate")
+    session_id = f"{new_session_id()}-{re.sub(r'[^A-Za-z0-9_-]+', '_', candidate_id)[:40]}"
+    total = int(profile.get("total_questions", len(answers) + 1))
+    script = profile.get("vision") or []
+
+    log_session_start(session_id, profile.get("participant_name", candidate_id), profile["position"], profile["grade"],
+                      log_dir=log_dir, total_questions=total, candidate_id=candidate_id, source="batch")
+    state = initial_state(profile.get("participant_name", candidate_id), profile["position"], profile["grade"],
+                          total_questions=total)
+    started = time.perf_counter()
+    for i, answer in enumerate([""] + answers):
+        prev_state = state
+        state = {**state, "last_user_input": answer}
+        if i and script:
+            state["vision_context"] = scripted_vision(script[(i - 1) % len(script)])
+        for kind, _, payload in stream_turn(get_graph(), state):
+            if kind == "state":
+                state = payload
+        if state.get('turns'):
+            log_turn(session_id, turn_record(prev_state, state), log_dir=log_dir)
+        if state.get('final_feedback'):
+            break
+
+    if not state.get('final_feedback'):
+        # Ответы в сценарии кончились раньше total_questions - подводим итог сами
+        state = {**state, **feedback_node(state)}
+    save_log(session_id, state['final_feedback'], state.get('final_report'), log_dir=log_dir)
+
+    if report_dir:
+        os.makedirs(report_dir, exist_ok=True)
+        with open(os.path.join(report_dir, f"{session_id}.md"), "w", encoding="utf-8") as f:
+            f.write(state['final_feedback'])
+
+    report = state.get('final_report') or {}
+    return {
+        "session_id": session_id,
+        "candidate_id": candidate_id,
+        "position": profile["position"],
+        "grade": profile["grade"],
+        "verdict": report.get("verdict"),
+        "expected_verdict": profile.get("expected_verdict"),
+        "overall_score": report.get("overall_score"),
+        "correct_percent": report.get("correct_percent"),
+        "scores": [t.get("combined", {}).get("score", 0) for t in state.get('turn_scores', []) if is_scored(t)],
+        "turns": len(state.get('turns', [])),
+        "wall_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def _safe_run(profile: Dict, log_dir: Optional[str], report_dir: Optional[str]) -> Dict:
+    try:
+        return run_interview(profile, log_dir, report_dir)
+    except Exception as e:
+        return {
+            "candidate_id": profile.get("candidate_id") or profile.get("participant_name"),
+            "position": profile.get("position"),
+            "grade": profile.get("grade"),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def _init_worker(fake_llm: bool, latency_s: float):
+    if fake_llm:
+        from benchmarks.fake_llm import install_fake_llm
+        install_fake_llm(latency_s)
+
+
+def summarize(results: List[Dict], correct_threshold: int = 70) -> Dict:
+    """Сводка по когортам position/grade: баллы (как в aggregate_final), вердикты, совпадение с ожидаемым."""
+    cohorts = {}
+    for r in results:
+        if not r.get("error"):
+            cohorts.setdefault(f"{r['position']} / {r['grade']}", []).append(r)
+
+    summary = {}
+    for cohort, items in sorted(cohorts.items()):
+        scores = np.array([s for r in items for s in r["scores"]], dtype=float)
+        overall = np.array([r["overall_score"] or 0 for r in items], dtype=float)
+        stats = score_summary(scores, correct_threshold)
+        labelled = [r for r in items if r.get("expected_verdict")]
+        summary[cohort] = {
+            "sessions": len(items),
+            "answers": stats["count"],
+            "avg_score": round(stats["avg"], 1),
+            "correct_percent": round(stats["correct_percent"], 1),
+            "overall_mean": round(float(overall.mean()), 1),
+            "overall_std": round(float(overall.std()), 1),
+            "verdicts": {v: sum(r["verdict"] == v for r in items) for v in sorted({r["verdict"] for r in items})},
+            "verdict_agreement": round(
+                sum(r["verdict"] == r["expected_verdict"] for r in labelled) / len(labelled), 3
+            ) if labelled else None,
+        }
+    return summary
+
+
+def run_batch(profiles: List[Dict], out_dir: str, workers: int = 8, processes: bool = False,
+              fake_llm: bool = False, latency_s: float = 0.0, log_dir: Optional[str] = None) -> Dict:
+    log_dir = log_dir or os.path.join(out_dir, "logs")
+    report_dir = os.path.join(out_dir, "reports")
+    os.makedirs(out_dir, exist_ok=True)
+
+    if processes:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fake_llm, latency_s))
+    else:
+        _init_worker(fake_llm, latency_s)
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    results = []
+    started = time.perf_counter()
+    with pool:
+        futures = [pool.submit(_safe_run, profile, log_dir, report_dir) for profile in profiles]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            status = result.get("error") or f"{result['verdict']} ({result['overall_score']})"
+            print(f"[{done}/{len(profiles)}] {result.get('candidate_id')}: {status}")
+    wall_s = time.perf_counter() - started
+
+    batch = {
+        "ts": time.time(),
+        "sessions": len(results),
+        "errors": sum(1 for r in results if r.get("error")),
+        "wall_s": round(wall_s, 2),
+        "sessions_per_min": round(len(results) * 60 / wall_s, 2) if wall_s else None,
+        "log_dir": log_dir,
+        "cohorts": summarize(results),
+        "results": results,
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(batch, f, ensure_ascii=False, indent=2)
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный прогон сценариев интервью без UI")
+    parser.add_argument("profiles", help="JSONL/JSON со сценариями кандидатов")
+    parser.add_argument("--out", default=os.path.join("batch_runs", time.strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--logs", help=f"каталог логов сессий (по умолчанию <out>/logs; {LOG_DIR} - общий с UI)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--processes", action="store_true", help="пул процессов вместо потоков")
+    parser.add_argument("--fake-llm", action="store_true", help="локальная FakeChatModel вместо Mistral (сухой прогон)")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка FakeChatModel, с")
+    parser.add_argument("--limit", type=int, help="взять только первые N сценариев")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profiles)[:args.limit]
+    batch = run_batch(profiles, args.out, workers=args.workers, processes=args.processes,
+                      fake_llm=args.fake_llm, latency_s=args.latency, log_dir=args.logs)
+    print(json.dumps(batch["cohorts"], ensure_ascii=False, indent=2))
+    print(f"Сессий: {batch['sessions']}, ошибок: {batch['errors']}, {batch['wall_s']} с. Итоги: {os.path.join(args.out, 'summary.json')}")
+
+
+if __name__ == "__main__":
+    main()
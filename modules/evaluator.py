@@ -1,12 +1,16 @@
 import os
 import json
-from typing import Dict, List, Optional
+import asyncio
+from typing import Dict, List, Optional, Sequence, Union
 
+import numpy as np
 from dotenv import load_dotenv
-from langchain_mistralai import ChatMistralAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from modules.cache import cache_for
+from modules.metrics import metrics_callback
+
 load_dotenv()
 
 
@@ -15,19 +19,27 @@ class MistralAnswerEvaluator:
         self,
         api_key: Optional[str] = None,
         model: str = None,
-        temperature: float = 0.2
+        temperature: float = 0.2,
+        llm=None
     ):
-        api_key = api_key or os.getenv("MISTRAL_API_KEY")
-        if not api_key:
-            raise ValueError("MISTRAL_API_KEY not found in .env")
+        if llm is None:
+            from langchain_mistralai import ChatMistralAI
 
-        model = model or os.getenv("MISTRAL_EVAL_MODEL", "mistral-small-latest")
+            api_key = api_key or os.getenv("MISTRAL_API_KEY")
+            if not api_key:
+                raise ValueError("MISTRAL_API_KEY not found in .env")
 
-        self.llm = ChatMistralAI(
-            model=model,
-            api_key=api_key,
-            temperature=temperature
-        )
+            model = model or os.getenv("MISTRAL_EVAL_MODEL", "mistral-small-latest")
+
+            llm = ChatMistralAI(
+                model=model,
+                api_key=api_key,
+                temperature=temperature,
+                cache=cache_for("evaluator"),
+                callbacks=[metrics_callback],
+                metadata={"chain": "evaluator"}
+            )
+        self.llm = llm
 
         self.prompt = ChatPromptTemplate.from_template("""
 Ты — строгий технический экзаменатор.
@@ -52,19 +64,79 @@ class MistralAnswerEvaluator:
 
     def evaluate_answer(self, question: str, answer: str, context: str = "") -> Dict:
         raw = self.chain.invoke({"question": question, "answer": answer, "context": context})
+        return self._parse(raw)
+
+    async def aevaluate_answer(self, question: str, answer: str, context: str = "") -> Dict:
+        raw = await self.chain.ainvoke({"question": question, "answer": answer, "context": context})
+        return self._parse(raw)
+
+    async def aevaluate_batch(
+        self,
+        items: Sequence[Union[Dict, tuple]],
+        max_concurrency: int = 8
+    ) -> List[Dict]:
+        """Оценивает пачку ответов параллельно, сохраняя порядок входа.
+
+        Элемент - dict с question/answer/context или кортеж (question, answer[, context]).
+        Результат - записи вида {"question", "answer", "combined", "error"},
+        которые можно сразу передать в aggregate_final как per_turn.
+        """
+        inputs = [_as_eval_input(item) for item in items]
+        raws = await self.chain.abatch(
+            inputs,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+
+        results = []
+        for inp, raw in zip(inputs, raws):
+            entry = {"question": inp["question"], "answer": inp["answer"], "error": None}
+            if isinstance(raw, Exception):
+                entry["error"] = f"{type(raw).__name__}: {raw}"
+                entry["combined"] = _failed_evaluation("Оценщик недоступен.", entry["error"])
+            else:
+                entry["combined"] = self._parse(raw)
+            results.append(entry)
+        return results
+
+    def evaluate_batch(
+        self,
+        items: Sequence[Union[Dict, tuple]],
+        max_concurrency: int = 8
+    ) -> List[Dict]:
+        """Синхронная обертка над aevaluate_batch (вне работающего event loop)."""
+        return asyncio.run(self.aevaluate_batch(items, max_concurrency=max_concurrency))
+
+    @staticmethod
+    def _parse(raw: str) -> Dict:
         clean = raw.strip().replace("```json", "").replace("```", "").strip()
         try:
-            data = json.loads(clean)
+            return json.loads(clean)
         except Exception:
-            data = {
-                "score": 0,
-                "correct": False,
-                "mistakes": ["Не удалось распарсить JSON оценщика."],
-                "good_points": [],
-                "topics_to_repeat": [],
-                "short_feedback": clean[:300]
-            }
-        return data
+            return _failed_evaluation("Не удалось распарсить JSON оценщика.", clean[:300])
+
+
+def _as_eval_input(item: Union[Dict, tuple]) -> Dict:
+    if isinstance(item, dict):
+        return {
+            "question": item.get("question", ""),
+            "answer": item.get("answer", ""),
+            "context": item.get("context", "")
+        }
+    question, answer, *rest = item
+    return {"question": question, "answer": answer, "context": rest[0] if rest else ""}
+
+
+def _failed_evaluation(mistake: str, feedback: str) -> Dict:
+    return {
+        "failed": True,
+        "score": 0,
+        "correct": False,
+        "mistakes": [mistake],
+        "good_points": [],
+        "topics_to_repeat": [],
+        "short_feedback": feedback
+    }
 
 
 class GPT4FreeEvaluator:
@@ -92,6 +164,30 @@ class GPT4FreeEvaluator:
         }
 
 
+def score_summary(scores, correct_threshold: int = 70) -> Dict:
+    """Средний балл и доля правильных ответов (score >= correct_threshold)."""
+    arr = np.asarray(scores, dtype=float)
+    if arr.size == 0:
+        return {"count": 0, "avg": 0.0, "correct_percent": 0.0}
+    return {
+        "count": int(arr.size),
+        "avg": float(arr.mean()),
+        "correct_percent": float((arr >= correct_threshold).mean() * 100.0)
+    }
+
+
+VERDICT_UNDEFINED = "Не определено"
+
+
+def verdict_for(avg: float, correct_percent: float) -> str:
+    return "Hire" if avg >= 75 and correct_percent >= 60 else "No Hire"
+
+
+def is_scored(entry: Dict) -> bool:
+    """Ответ оценен: оценщик ответил и его JSON разобран (сбой оценщика - не ноль баллов)."""
+    return not entry.get("error") and not entry.get("combined", {}).get("failed")
+
+
 def aggregate_final(
     position: str,
     questions: List[str],
@@ -99,11 +195,15 @@ def aggregate_final(
     per_turn: List[Dict],
     correct_threshold: int = 70
 ) -> Dict:
-    scores = [t.get("combined", {}).get("score", 0) for t in per_turn] if per_turn else []
-    avg = sum(scores) / len(scores) if scores else 0
-
-    correct_flags = [bool(t.get("combined", {}).get("score", 0) >= correct_threshold) for t in per_turn]
-    correct_percent = (sum(correct_flags) / len(correct_flags) * 100.0) if correct_flags else 0.0
+    per_turn = per_turn or []
+    evaluation_errors = sum(1 for t in per_turn if not is_scored(t))
+    per_turn = [t for t in per_turn if is_scored(t)]
+    summary = score_summary(
+        [t.get("combined", {}).get("score", 0) for t in per_turn],
+        correct_threshold
+    )
+    avg = summary["avg"]
+    correct_percent = summary["correct_percent"]
 
     strengths = []
     weaknesses = []
@@ -128,12 +228,15 @@ def aggregate_final(
     weaknesses = uniq(weaknesses)[:7]
     topics = uniq(topics)[:7]
 
-    verdict = "Hire" if avg >= 75 and correct_percent >= 60 else "No Hire"
+    # Без единого оцененного ответа (все пропущены, оценщик недоступен) решения нет
+    verdict = verdict_for(avg, correct_percent) if per_turn else VERDICT_UNDEFINED
 
     return {
         "overall_score": int(round(avg)),
         "correct_percent": round(correct_percent, 1),
         "verdict": verdict,
+        "answers_scored": len(per_turn),
+        "evaluation_errors": evaluation_errors,
         "grade_estimate": "Junior/Middle/Senior (эвристика не настроена)",
         "strengths": strengths,
         "weaknesses": weaknesses,
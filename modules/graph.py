@@ -1,120 +1,489 @@
-from typing import TypedDict, List, Dict
-from langgraph.graph import StateGraph, END
+from typing import TypedDict, List, Dict, Annotated, Union
+from langgraph.graph import StateGraph, START, END
 import json
-from modules.agents import observer_chain, interviewer_chain, feedback_chain
+import operator
+import os
+import threading
+import time
+from modules import agents
+from modules.evaluator import VERDICT_UNDEFINED, MistralAnswerEvaluator, aggregate_final
+from modules.metrics import collect, get_metrics, span, timed_node
+from modules.question_bank import get_question_bank
+
+STREAMED_NODES = ("interviewer", "feedback")
+CHECKPOINT_DB = os.getenv("GRAPH_CHECKPOINT_DB", os.path.join(".cache", "checkpoints.sqlite"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "400"))
+# Лимит слов для промпта конспекта: бюджет clip_to_budget (~3 символа на токен) при ~10 символах
+# на русское слово с пробелом, чтобы обрезка оставалась страховкой, а не срезала новый ход
+SUMMARY_MAX_WORDS = SUMMARY_TOKEN_BUDGET * 3 // 10
+REPORT_POLISH = os.getenv("REPORT_POLISH", "0") == "1"
+FINDING_KEYS = ("strengths", "gaps", "flags")
+REPORT_TOP_N = 7
+VISION_FLAGS = {
+    "phone": "Телефон в кадре во время ответа",
+    "absent": "Кандидат отсутствовал в кадре",
+    "materials": "Книги/ноутбук рядом с кандидатом",
+}
+
+def merge_turns(left: List[Dict], right: List[Dict]) -> List[Dict]:
+    """Редьюсер turns: записи с тем же turn_id дополняются, новые добавляются в конец."""
+    merged = list(left or [])
+    index = {turn.get("turn_id"): i for i, turn in enumerate(merged)}
+    for turn in right or []:
+        i = index.get(turn.get("turn_id"))
+        if i is None:
+            index[turn.get("turn_id")] = len(merged)
+            merged.append(turn)
+        else:
+            merged[i] = {**merged[i], **turn}
+    return merged
+
+def merge_findings(left: Dict, right: Dict) -> Dict:
+    """Редьюсер report_state: складывает счетчики находок по ходам.
+
+    Формат: {"turns": n, "strengths": {текст: сколько раз}, "gaps": {...}, "flags": {...}};
+    одинаковые формулировки (без учета регистра) схлопываются в одну.
+    """
+    left, right = left or {}, right or {}
+    merged = {"turns": left.get("turns", 0) + right.get("turns", 0)}
+    for key in FINDING_KEYS:
+        counts = dict(left.get(key, {}))
+        index = {item.casefold(): item for item in counts}
+        for item, n in right.get(key, {}).items():
+            item = index.setdefault(item.casefold(), item)
+            counts[item] = counts.get(item, 0) + n
+        merged[key] = counts
+    return merged
+
+def turn_findings(findings, vision_context: Union[str, Dict]) -> Dict:
+    """Находки одного хода в формате report_state (включая алерты камеры)."""
+    findings = findings if isinstance(findings, dict) else {}
+    delta = {"turns": 1}
+    for key in FINDING_KEYS:
+        items = findings.get(key) or []
+        if isinstance(items, str):
+            items = [items]
+        delta[key] = {}
+        for item in items:
+            item = str(item).strip()
+            if item:
+                delta[key][item] = delta[key].get(item, 0) + 1
+    if isinstance(vision_context, dict):
+        for alert in vision_context.get("alerts", []):
+            label = VISION_FLAGS.get(alert, alert)
+            delta["flags"][label] = delta["flags"].get(label, 0) + 1
+    return delta
 
 class AgentState(TypedDict):
     participant_name: str
     position: str
     grade: str
-    history: List[str]
-    turns: List[Dict]
+    history: Annotated[List[str], operator.add]
+    turns: Annotated[List[Dict], merge_turns]
     current_difficulty: int
     last_user_input: str
-    vision_context: str
+    vision_context: Union[str, Dict]
     observer_instruction: str
-    all_observer_thoughts: List[str]
+    all_observer_thoughts: Annotated[List[str], operator.add]
     final_feedback: str
     conversation_active: bool
     total_questions: int
     current_question_number: int
+    last_agent_message: str
+    turn_scores: Annotated[List[Dict], operator.add]
+    final_report: Dict
+    memory_summary: str
+    report_state: Annotated[Dict, merge_findings]
+    bank_question: Dict
+    asked_questions: Annotated[List[str], operator.add]
+
+_evaluator = None
+_evaluator_lock = threading.Lock()
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_evaluator():
+    global _evaluator
+    with _evaluator_lock:
+        if _evaluator is None:
+            _evaluator = MistralAnswerEvaluator()
+        return _evaluator
+
+def set_evaluator(evaluator):
+    """Подменяет общий оценщик (None - создать заново при следующем ходе)."""
+    global _evaluator
+    with _evaluator_lock:
+        _evaluator = evaluator
+
+def is_stop_command(text: str) -> bool:
+    """Кандидат попросил закончить интервью ("стоп") - такой ввод не оценивается как ответ."""
+    return "стоп" in (text or "").lower()
+
+def clip_to_budget(text: str, max_tokens: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """Обрезает текст по грубой оценке ~3 символа на токен (для русского текста)."""
+    max_chars = max_tokens * 3
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + "…"
+
+def format_vision(vision_context: Union[str, Dict]) -> str:
+    if isinstance(vision_context, dict):
+        return json.dumps({
+            "summary": vision_context.get("text"),
+            "alerts": vision_context.get("alerts", []),
+            "frames_in_window": vision_context.get("frames", 0),
+            "window_s": vision_context.get("window_s")
+        }, ensure_ascii=False)
+    return vision_context
+
+def pick_from_bank(state: AgentState, difficulty: int, topic: str = "") -> Dict:
+    """Следующий вопрос из локального банка ({} - банка нет или подходящих вопросов не осталось)."""
+    bank = get_question_bank()
+    if bank is None:
+        return {}
+    with span("question_bank.pick"):
+        return bank.pick(state['position'], state['grade'], difficulty, topic,
+                         exclude=state.get('asked_questions') or []) or {}
 
 def observer_node(state: AgentState):
     if not state['last_user_input']:
         return {
             "observer_instruction": f"Поприветствуй {state['participant_name']} и начни собеседование на {state['position']}.",
-            "all_observer_thoughts": ["Start of interview"]
+            "all_observer_thoughts": ["Start of interview"],
+            "bank_question": pick_from_bank(state, state['current_difficulty'])
         }
 
     try:
-        response = observer_chain.invoke({
+        response = agents.observer_chain.invoke({
             "position": state['position'],
             "grade": state['grade'],
             "difficulty": state['current_difficulty'],
+            "memory_summary": state.get('memory_summary') or "Пока пусто.",
             "history": "\n".join(state['history'][-2:]),
             "last_user_input": state['last_user_input'],
-            "vision_data": state['vision_context']
+            "vision_data": format_vision(state['vision_context'])
         })
         
         clean_json = response.replace("```json", "").replace("```", "").strip()
         data = json.loads(clean_json)
         
         new_diff = max(1, min(10, state['current_difficulty'] + data.get("difficulty_adjustment", 0)))
+        # Новую тему берем из банка, LLM интервьюера нужен только для уточняющих вопросов
+        question = {}
+        if data.get("next_action") == "new_topic" and data.get("status") != "finish":
+            question = pick_from_bank(state, new_diff, data.get("next_topic") or "")
         
         turn_log = {
             "turn_id": len(state['turns']) + 1,
             "user_message": state['last_user_input'],
-            "internal_thoughts": f"[Observer]: {data.get('thought_process')} | [Vision]: {state['vision_context']}"
+            "internal_thoughts": f"[Observer]: {data.get('thought_process')} | [Vision]: {format_vision(state['vision_context'])}"
         }
+        if question:
+            turn_log["internal_thoughts"] += f" | [Bank]: {question['id']} ({question['topic']})"
         
         return {
             "observer_instruction": data.get("next_instruction_to_interviewer"),
             "current_difficulty": new_diff,
             "all_observer_thoughts": [data.get('thought_process')],
             "turns": [turn_log],
+            "report_state": turn_findings(data.get("findings"), state['vision_context']),
+            "bank_question": question,
             "conversation_active": data.get("status") != "finish"
         }
     except Exception as e:
         print(f"Observer Error: {e}")
-        return {"observer_instruction": "Продолжай интервью.", "all_observer_thoughts": ["Error parsing"]}
+        return {"observer_instruction": "Продолжай интервью.", "all_observer_thoughts": ["Error parsing"], "bank_question": {}}
+
+def memory_node(state: AgentState):
+    answer = state['last_user_input']
+    if not answer:
+        return {}
+
+    try:
+        summary = agents.summary_chain.invoke({
+            "position": state['position'],
+            "grade": state['grade'],
+            "memory_summary": state.get('memory_summary') or "Пока пусто.",
+            "question": clip_to_budget(state.get('last_agent_message', ''), SUMMARY_TOKEN_BUDGET // 4),
+            "answer": clip_to_budget(answer, SUMMARY_TOKEN_BUDGET // 2),
+            "observer_thought": clip_to_budget((state.get('all_observer_thoughts') or [""])[-1] or "", SUMMARY_TOKEN_BUDGET // 4),
+            "max_words": SUMMARY_MAX_WORDS
+        })
+    except Exception as e:
+        print(f"Memory Error: {e}")
+        return {}
+
+    return {"memory_summary": clip_to_budget(summary.strip())}
+
+def evaluator_node(state: AgentState):
+    answer = state['last_user_input']
+    question = state.get('last_agent_message', '')
+    if not answer or not question or answer.startswith('[SKIPPED') or is_stop_command(answer):
+        return {}
+
+    try:
+        combined = get_evaluator().evaluate_answer(
+            question, answer, context=f"{state['position']} ({state['grade']})"
+        )
+    except Exception as e:
+        print(f"Evaluator Error: {e}")
+        # Сбой оценщика фиксируем явно: ответ не оценен, а не получил 0 баллов
+        return {
+            "turn_scores": [{
+                "question_number": state.get('current_question_number', 0),
+                "question": question,
+                "answer": answer,
+                "error": f"{type(e).__name__}: {e}",
+                "combined": {}
+            }]
+        }
+
+    return {
+        "turn_scores": [{
+            "question_number": state.get('current_question_number', 0),
+            "question": question,
+            "answer": answer,
+            "combined": combined
+        }]
+    }
 
 def interviewer_node(state: AgentState):
     if not state['conversation_active']:
         return {}
 
-    msg = interviewer_chain.invoke({
-        "candidate_name": state['participant_name'],
-        "position": state['position'],
-        "observer_instruction": state['observer_instruction'],
-        "last_user_input": state['last_user_input']
-    })
+    question = state.get('bank_question') or {}
+    get_metrics().observe("question_bank.hit", float(bool(question)))
+    if question:
+        msg = question['question']
+        if not state['turns']:
+            msg = f"Здравствуйте, {state['participant_name']}! Начнем собеседование на позицию {state['position']}. {msg}"
+    else:
+        msg = agents.interviewer_chain.invoke({
+            "candidate_name": state['participant_name'],
+            "position": state['position'],
+            "observer_instruction": state['observer_instruction'],
+            "last_user_input": state['last_user_input']
+        })
     
     cur = int(state.get('current_question_number', 0)) + 1
     total = int(state.get('total_questions', 10))
     numbered_msg = f"{cur}/{total} {msg}"
 
     if state['turns']:
-        state['turns'][-1]['agent_visible_message'] = numbered_msg
+        turn = {"turn_id": state['turns'][-1]['turn_id'], "agent_visible_message": numbered_msg}
     else:
-        state['turns'].append({
+        turn = {
             "turn_id": 1,
             "agent_visible_message": numbered_msg,
             "internal_thoughts": "Intro",
             "user_message": state.get('last_user_input', '')
-        })
+        }
 
     conversation_active = True
     if cur >= total:
         conversation_active = False
 
     return {
+        "turns": [turn],
         "history": [f"User: {state['last_user_input']}", f"Agent: {numbered_msg}"],
+        "last_agent_message": msg,
         "current_question_number": cur,
+        "asked_questions": [question['id']] if question else [],
         "conversation_active": conversation_active
     }
 
+def top_findings(report_state: Dict, key: str, n: int = REPORT_TOP_N) -> List[str]:
+    counts = (report_state or {}).get(key, {})
+    return [item for item, _ in sorted(counts.items(), key=lambda kv: -kv[1])[:n]]
+
+def render_report(state: AgentState, report: Dict) -> str:
+    """Собирает Markdown-отчет из накопленных находок и агрегированных оценок.
+
+    Объем работы зависит только от REPORT_TOP_N, а не от числа вопросов.
+    """
+    findings = state.get('report_state') or {}
+    strengths = top_findings(findings, "strengths") or report.get("strengths", [])
+    gaps = top_findings(findings, "gaps") or report.get("weaknesses", [])
+    flags = top_findings(findings, "flags")
+    topics = report.get("topics_to_study") or gaps
+
+    def bullets(items, empty):
+        return "\n".join(f"- {item}" for item in items) if items else f"- {empty}"
+
+    lines = [
+        "# Результат",
+        f"**Позиция:** {state['position']}",
+        f"**Целевой грейд:** {state['grade']}",
+        f"**Решение:** {report.get('verdict') or VERDICT_UNDEFINED}",
+    ]
+    answered = report.get("answers_scored", 0)
+    if answered:
+        lines.append(
+            f"**Средний балл:** {report['overall_score']}/100, "
+            f"правильных ответов {report['correct_percent']}% (оценено ответов: {answered})"
+        )
+    if report.get("evaluation_errors"):
+        lines.append(f"**Не оценено из-за сбоя оценщика:** {report['evaluation_errors']}")
+    lines += [
+        "",
+        "# Анализ",
+        "## Hard Skills",
+        "### Сильные стороны:",
+        bullets(strengths, "Не выявлены"),
+        "### Пробелы:",
+        bullets(gaps, "Не выявлены"),
+        "## Soft Skills & Поведение",
+        bullets(flags, "Нарушений не замечено"),
+        "",
+        "# Рекомендации",
+        bullets(topics, "Продолжать в том же духе"),
+    ]
+    return "\n".join(lines)
+
 def feedback_node(state: AgentState):
-    res = feedback_chain.invoke({
-        "position": state['position'],
-        "all_observer_thoughts": "\n".join(state['all_observer_thoughts'])
-    })
-    return {"final_feedback": res}
+    per_turn = state.get('turn_scores', [])
+    report = aggregate_final(
+        state['position'],
+        [t["question"] for t in per_turn],
+        [t["answer"] for t in per_turn],
+        per_turn
+    )
+    findings = state.get('report_state') or {}
+    report["findings"] = {key: top_findings(findings, key) for key in FINDING_KEYS}
+    draft = render_report(state, report)
+    if REPORT_POLISH:
+        try:
+            draft = agents.feedback_chain.invoke({
+                "position": state['position'],
+                "memory_summary": state.get('memory_summary') or "Нет данных.",
+                "draft_report": draft
+            })
+        except Exception as e:
+            print(f"Report polish error: {e}")
+    return {"final_feedback": draft, "final_report": report}
+
+def initial_state(participant_name: str, position: str, grade: str, total_questions: int = 10) -> AgentState:
+    return {
+        "participant_name": participant_name,
+        "position": position,
+        "grade": grade,
+        "history": [],
+        "turns": [],
+        "current_difficulty": 5,
+        "last_user_input": "",
+        "vision_context": "Camera active",
+        "observer_instruction": "",
+        "all_observer_thoughts": [],
+        "final_feedback": "",
+        "conversation_active": True,
+        "total_questions": total_questions,
+        "current_question_number": 0,
+        "last_agent_message": "",
+        "turn_scores": [],
+        "final_report": {},
+        "memory_summary": "",
+        "report_state": {},
+        "bank_question": {},
+        "asked_questions": []
+    }
+
+def get_checkpointer(path: str = CHECKPOINT_DB):
+    """SQLite-чекпоинтер состояния графа (общий на процесс).
+
+    Файл можно открыть из нескольких процессов, поэтому сессию продолжает
+    любой воркер на этом хосте.
+    """
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
 
-def build_graph():
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            _checkpointer = SqliteSaver(conn)
+        return _checkpointer
+
+def thread_config(session_id: str) -> Dict:
+    return {"configurable": {"thread_id": session_id}}
+
+def resume_state(graph, session_id: str) -> Dict:
+    """Последнее сохраненное состояние сессии ({} - если сессии нет)."""
+    return dict(graph.get_state(thread_config(session_id)).values or {})
+
+def build_graph(checkpointer=None):
     workflow = StateGraph(AgentState)
-    workflow.add_node("observer", observer_node)
-    workflow.add_node("interviewer", interviewer_node)
-    workflow.add_node("feedback", feedback_node)
+    workflow.add_node("observer", timed_node("observer")(observer_node))
+    workflow.add_node("interviewer", timed_node("interviewer")(interviewer_node))
+    workflow.add_node("evaluator", timed_node("evaluator")(evaluator_node))
+    workflow.add_node("memory", timed_node("memory")(memory_node))
+    workflow.add_node("feedback", timed_node("feedback")(feedback_node))
+    
+    workflow.add_node("turn_end", lambda state: {})
     
-    workflow.set_entry_point("observer")
+    # Критический путь хода - observer -> interviewer. Оценка и конспект идут в том же
+    # шаге, что и интервьюер (LangGraph выполняет граф синхронными шагами, поэтому ветки от START
+    # задержали бы интервьюера), и сходятся перед маршрутизацией к отчету.
+    workflow.add_edge(START, "observer")
     workflow.add_edge("observer", "interviewer")
+    workflow.add_edge("observer", "evaluator")
+    workflow.add_edge("observer", "memory")
+    workflow.add_edge(["interviewer", "evaluator", "memory"], "turn_end")
     
     def router(state):
-        if not state['conversation_active'] or "стоп" in state['last_user_input'].lower():
+        if not state['conversation_active'] or is_stop_command(state['last_user_input']):
             return "feedback"
         return END
 
-    workflow.add_conditional_edges("interviewer", router, {"feedback": "feedback", END: END})
+    workflow.add_conditional_edges("turn_end", router, {"feedback": "feedback", END: END})
     workflow.add_edge("feedback", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+def stream_turn(graph, state, config=None):
+    """Прогоняет граф, отдавая токены interviewer/feedback по мере генерации.
+
+    Отдает кортежи ("token", node, text), ("message", "interviewer", text) сразу
+    после завершения интервьюера и последним - ("state", None, final_state).
+    Метрики прогона (modules.metrics) записываются в turns[-1]["metrics"].
+    Для графа с чекпоинтером state - только новые поля хода (last_user_input,
+    vision_context), а config - thread_config(session_id); метрики тогда
+    дописываются и в чекпоинт, чтобы пережить следующий ход и возобновление.
+    """
+    final_state = state
+    first_token_ms = None
+    with collect() as metrics:
+        for mode, chunk in graph.stream(state, config, stream_mode=["messages", "updates", "values"]):
+            if mode == "messages":
+                message, meta = chunk
+                node = meta.get("langgraph_node")
+                if node in STREAMED_NODES and isinstance(message.content, str) and message.content:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - metrics.started) * 1000
+                        get_metrics().observe("turn.first_token_ms", first_token_ms)
+                    yield "token", node, message.content
+            elif mode == "updates":
+                update = chunk.get("interviewer") or {}
+                if update.get("turns"):
+                    yield "message", "interviewer", update["turns"][-1].get("agent_visible_message", "")
+            else:
+                final_state = chunk
+
+    if final_state.get('turns'):
+        turn_metrics = metrics.to_dict()
+        turn_metrics["first_token_ms"] = round(first_token_ms, 1) if first_token_ms is not None else None
+        turns = list(final_state['turns'])
+        turns[-1] = {**turns[-1], "metrics": turn_metrics}
+        final_state = {**final_state, "turns": turns}
+        if config and getattr(graph, "checkpointer", None):
+            try:
+                # merge_turns дополнит ход по turn_id; as_node по умолчанию - последний узел прогона,
+                # его ребра ведут туда же, что и в прогоне, поэтому новых задач не появится
+                graph.update_state(config, {"turns": [{"turn_id": turns[-1].get("turn_id"), "metrics": turn_metrics}]})
+            except Exception as e:
+                print(f"Checkpoint metrics error: {e}")
+    yield "state", None, final_state
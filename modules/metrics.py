@@ -0,0 +1,254 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "500"))
+# Цена за 1M токенов (USD), по умолчанию - прайс mistral-large
+PRICE_INPUT_PER_M = float(os.getenv("LLM_PRICE_INPUT_PER_M", "2.0"))
+PRICE_OUTPUT_PER_M = float(os.getenv("LLM_PRICE_OUTPUT_PER_M", "6.0"))
+
+
+class RollingStats:
+    """Скользящие окна последних значений метрик с перцентилями p50/p95."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._series: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = deque(maxlen=self.window)
+            series.append(float(value))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            series = {name: np.fromiter(values, dtype=float) for name, values in self._series.items() if values}
+        result = {}
+        for name, values in sorted(series.items()):
+            p50, p95 = np.percentile(values, [50, 95])
+            result[name] = {
+                "count": int(values.size),
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "mean": round(float(values.mean()), 2),
+                "last": round(float(values[-1]), 2),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class TurnMetrics:
+    """Метрики одного прогона графа: узлы, вызовы LLM и прочие участки.
+
+    Узлы графа выполняются параллельно в разных потоках, поэтому запись
+    идет под блокировкой.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.nodes: Dict[str, Dict] = {}
+        self.llm_calls = []
+        self.spans: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def node(self, name: str) -> Dict:
+        entry = self.nodes.get(name)
+        if entry is None:
+            entry = self.nodes[name] = {
+                "wall_ms": 0.0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "retries": 0, "cache_hits": 0, "cache_misses": 0
+            }
+        return entry
+
+    def add(self, node: Optional[str], **values):
+        with self._lock:
+            entry = self.node(node or "other")
+            for key, value in values.items():
+                entry[key] = entry.get(key, 0) + value
+
+    def add_call(self, call: Dict):
+        with self._lock:
+            self.llm_calls.append(call)
+
+    def add_span(self, name: str, ms: float):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            nodes = {name: dict(entry, wall_ms=round(entry["wall_ms"], 1)) for name, entry in self.nodes.items()}
+            calls = list(self.llm_calls)
+            spans = {name: round(ms, 1) for name, ms in self.spans.items()}
+        prompt_tokens = sum(n["prompt_tokens"] for n in nodes.values())
+        completion_tokens = sum(n["completion_tokens"] for n in nodes.values())
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "nodes": nodes,
+            "llm_calls": calls,
+            "spans": spans,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cache_hits": sum(n["cache_hits"] for n in nodes.values()),
+            "cost_usd": round(cost_usd(prompt_tokens, completion_tokens), 6),
+        }
+
+
+_rolling = RollingStats()
+_current: ContextVar[Optional[TurnMetrics]] = ContextVar("turn_metrics", default=None)
+_current_node: ContextVar[Optional[str]] = ContextVar("metrics_node", default=None)
+
+
+def get_metrics() -> RollingStats:
+    return _rolling
+
+
+def cost_usd(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * PRICE_INPUT_PER_M + completion_tokens * PRICE_OUTPUT_PER_M) / 1_000_000
+
+
+@contextmanager
+def collect():
+    """Собирает метрики всех узлов и вызовов LLM внутри блока в один TurnMetrics."""
+    metrics = TurnMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        _rolling.observe("turn.total_ms", (time.perf_counter() - metrics.started) * 1000)
+
+
+@contextmanager
+def span(name: str):
+    """Замеряет участок кода (vision, TTS и т.п.): скользящая статистика + текущий ход."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        _rolling.observe(f"{name}_ms", ms)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_span(name, ms)
+
+
+def timed_node(name: str):
+    """Декоратор узла графа: время узла и привязка вызовов LLM внутри него к узлу."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _current_node.set(name)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - start) * 1000
+                _current_node.reset(token)
+                _rolling.observe(f"node.{name}_ms", ms)
+                metrics = _current.get()
+                if metrics is not None:
+                    metrics.add(name, wall_ms=ms)
+        return wrapper
+    return decorator
+
+
+def record_cache_lookup(hit: bool):
+    """Вызывается кэшем LLM при каждом lookup."""
+    _rolling.observe("llm.cache_hit", 1.0 if hit else 0.0)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(_current_node.get(), cache_hits=int(hit), cache_misses=int(not hit))
+
+
+def _usage(response) -> Dict[str, int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return {"prompt_tokens": usage.get("prompt_tokens", 0) or 0, "completion_tokens": usage.get("completion_tokens", 0) or 0}
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """Callback LangChain: время, токены и ретраи каждого вызова модели."""
+
+    def __init__(self):
+        self._runs: Dict[Any, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, metadata):
+        with self._lock:
+            self._runs[run_id] = {
+                "start": time.perf_counter(),
+                "chain": (metadata or {}).get("chain"),
+                "node": _current_node.get(),
+                "retries": 0,
+            }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_retry(self, retry_state, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            if run_id in self._runs:
+                self._runs[run_id]["retries"] += 1
+
+    def _finish(self, run_id, usage: Dict[str, int], error: Optional[str] = None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        ms = (time.perf_counter() - run["start"]) * 1000
+        chain = run["chain"] or "llm"
+        _rolling.observe(f"llm.{chain}_ms", ms)
+        _rolling.observe("llm.retries", run["retries"])
+        if usage["prompt_tokens"] or usage["completion_tokens"]:
+            _rolling.observe("llm.prompt_tokens", usage["prompt_tokens"])
+            _rolling.observe("llm.completion_tokens", usage["completion_tokens"])
+
+        metrics = _current.get()
+        if metrics is None:
+            return
+        metrics.add(run["node"], llm_calls=1, retries=run["retries"], **usage)
+        call = {"node": run["node"], "chain": chain, "wall_ms": round(ms, 1), "retries": run["retries"], **usage}
+        if error:
+            call["error"] = error
+        metrics.add_call(call)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, _usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, {"prompt_tokens": 0, "completion_tokens": 0}, error=type(error).__name__)
+
+
+metrics_callback = MetricsCallback()
+
+
+def export_json(extra: Optional[Dict] = None) -> str:
+    """Машиночитаемый срез скользящих метрик (для SLO и сравнения между версиями)."""
+    return json.dumps({
+        "ts": time.time(),
+        "window": _rolling.window,
+        "metrics": _rolling.snapshot(),
+        **(extra or {})
+    }, ensure_ascii=False, indent=2)
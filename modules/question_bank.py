@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "question_bank.jsonl"))
+INDEX_DIR = os.getenv("QUESTION_INDEX_DIR", os.path.join(".cache", "question_index"))
+BANK_DISABLED = os.getenv("QUESTION_BANK_DISABLE", "0") == "1"
+MAX_DIFFICULTY_GAP = int(os.getenv("QUESTION_BANK_MAX_GAP", "2"))
+DIFFICULTY_PENALTY = 0.15
+STEM_LEN = 6
+GENERIC_WORDS = {"developer", "engineer", "разработчик", "инженер"}
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова в нижнем регистре, обрезанные до STEM_LEN символов - грубая замена стеммингу для русского."""
+    return [w[:STEM_LEN] for w in re.findall(r"\w+", text.lower()) if len(w) > 1]
+
+
+def position_words(position: str) -> set:
+    return set(re.findall(r"\w+", position.lower())) - GENERIC_WORDS
+
+
+def load_bank(path: str = BANK_PATH) -> List[Dict]:
+    """Вопросы банка: JSONL с полями id, position, grades, difficulty, topic, question."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_index(records: List[Dict], index_dir: str, source_digest: str) -> None:
+    """Считает TF-IDF (тема + текст вопроса) и сохраняет матрицу в .npy рядом со словарем.
+
+    Строки L2-нормированы, поэтому косинусная близость - это скалярное произведение.
+    """
+    docs = [tokenize(f"{r['topic']} {r['topic']} {r['question']}") for r in records]
+    vocab = sorted({w for doc in docs for w in doc})
+    column = {w: i for i, w in enumerate(vocab)}
+
+    tf = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    for row, doc in enumerate(docs):
+        for w in doc:
+            tf[row, column[w]] += 1
+    df = (tf > 0).sum(axis=0)
+    idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+    matrix = tf * idf
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9)
+
+    os.makedirs(index_dir, exist_ok=True)
+    # Уникальные временные имена: индекс могут одновременно строить несколько процессов (batch --processes)
+    suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+    for name, array in (("tfidf", matrix), ("idf", idf)):
+        tmp = os.path.join(index_dir, f"{name}.{suffix}.npy")
+        np.save(tmp, array)
+        os.replace(tmp, os.path.join(index_dir, f"{name}.npy"))
+    tmp = os.path.join(index_dir, f"meta.{suffix}.json")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source_digest": source_digest, "vocab": vocab, "records": records}, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(index_dir, "meta.json"))
+
+
+class QuestionBank:
+    """Банк вопросов с локальным TF-IDF индексом.
+
+    Индекс строится один раз (и заново - только при изменении файла банка),
+    матрица открывается через np.load(mmap_mode="r") и делится между процессами
+    через page cache.
+    """
+
+    def __init__(self, path: str = BANK_PATH, index_dir: str = INDEX_DIR):
+        digest = file_digest(path)
+        meta = self._read_meta(index_dir)
+        if meta is None or meta.get("source_digest") != digest:
+            build_index(load_bank(path), index_dir, digest)
+        try:
+            self._open(index_dir, digest)
+        except ValueError:
+            # Файлы индекса от разных сборок или обрезаны - пересобираем один раз
+            build_index(load_bank(path), index_dir, digest)
+            self._open(index_dir, digest)
+
+    def _open(self, index_dir: str, digest: str):
+        meta = self._read_meta(index_dir)
+        if meta is None or meta.get("source_digest") != digest:
+            raise ValueError("question index is stale")
+        self.records: List[Dict] = meta["records"]
+        self.column = {w: i for i, w in enumerate(meta["vocab"])}
+        self.idf = np.load(os.path.join(index_dir, "idf.npy"), mmap_mode="r")
+        self.matrix = np.load(os.path.join(index_dir, "tfidf.npy"), mmap_mode="r")
+        if self.matrix.shape != (len(self.records), len(self.column)) or self.idf.shape != (len(self.column),):
+            raise ValueError("question index files do not match")
+        self.by_id = {r["id"]: i for i, r in enumerate(self.records)}
+
+    @staticmethod
+    def _read_meta(index_dir: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vec = np.zeros(len(self.column), dtype=np.float32)
+        for w in tokenize(text):
+            i = self.column.get(w)
+            if i is not None:
+                vec[i] += 1
+        vec *= self.idf
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def candidates(self, position: str, grade: str) -> List[int]:
+        words = position_words(position)
+        return [
+            i for i, r in enumerate(self.records)
+            if words & position_words(r["position"]) and (not r.get("grades") or grade in r["grades"])
+        ]
+
+    def pick(self, position: str, grade: str, difficulty: int, topic: str = "",
+             exclude: Iterable[str] = ()) -> Optional[Dict]:
+        """Лучший незаданный вопрос для позиции/грейда: близость к теме минус штраф за разницу сложности.
+
+        None - если подходящих вопросов нет (тогда вопрос формулирует LLM).
+        Результат детерминирован: при равенстве выигрывает вопрос выше в банке.
+        """
+        excluded = set(exclude)
+        rows = [i for i in self.candidates(position, grade)
+                if self.records[i]["id"] not in excluded
+                and abs(self.records[i]["difficulty"] - difficulty) <= MAX_DIFFICULTY_GAP]
+        if not rows:
+            return None
+
+        gaps = np.array([abs(self.records[i]["difficulty"] - difficulty) for i in rows], dtype=np.float32)
+        scores = -DIFFICULTY_PENALTY * gaps
+        if topic:
+            scores += self.matrix[rows] @ self.vectorize(topic)
+        best = rows[int(np.argmax(scores))]
+        return dict(self.records[best])
+
+
+def get_question_bank() -> Optional[QuestionBank]:
+    """Общий банк на процесс; None - если банк отключен, файла нет или индекс не читается."""
+    global _bank
+    if BANK_DISABLED:
+        return None
+    with _bank_lock:
+        if _bank is None:
+            try:
+                _bank = QuestionBank()
+            except (OSError, ValueError) as e:
+                print(f"Question bank unavailable: {e}")
+                return None
+        return _bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка индекса банка вопросов и пробный подбор")
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать индекс, даже если банк не менялся")
+    parser.add_argument("--position", default="Python Backend")
+    parser.add_argument("--grade", default="Middle")
+    parser.add_argument("--difficulty", type=int, default=5)
+    parser.add_argument("--topic", default="")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build_index(load_bank(BANK_PATH), INDEX_DIR, file_digest(BANK_PATH))
+    bank = QuestionBank()
+    print(f"Вопросов: {len(bank.records)}, словарь: {len(bank.column)}, индекс: {INDEX_DIR}")
+    print(json.dumps(bank.pick(args.position, args.grade, args.difficulty, args.topic), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
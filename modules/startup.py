@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Union
+
+WARMUP_STEPS = tuple(s.strip() for s in os.getenv("WARMUP_STEPS", "graph,bank,vision,tts").split(",") if s.strip())
+
+# Замеры холодного старта: шаг -> мс (или текст ошибки)
+timings: Dict[str, Union[float, str]] = {}
+_timings_lock = threading.Lock()
+_metrics = None
+
+
+def record(name: str, ms: Union[float, str]):
+    """Запоминает замер (первый для каждого шага) и, если метрики уже загружены, отдает его в них."""
+    with _timings_lock:
+        if name in timings:
+            return
+        timings[name] = round(ms, 1) if isinstance(ms, float) else ms
+        metrics = _metrics
+    if metrics is not None and isinstance(ms, float):
+        metrics.observe(f"startup.{name}", ms)
+
+
+def _warm_graph():
+    from modules import agents, graph
+    graph.get_checkpointer()
+    agents.observer_chain  # собирает клиентов Mistral всех цепочек
+
+
+def _warm_bank():
+    from modules.question_bank import get_question_bank
+    get_question_bank()  # при изменении банка пересобирает индекс
+
+
+def _warm_vision():
+    from modules.vision import get_vision_service
+    get_vision_service()
+
+
+def _warm_tts():
+    from modules.audio import get_tts_backend
+    get_tts_backend()
+
+
+STEPS = {"graph": _warm_graph, "bank": _warm_bank, "vision": _warm_vision, "tts": _warm_tts}
+
+
+def warm_up(steps: Iterable[str] = WARMUP_STEPS) -> Dict:
+    """Загружает тяжелые модули и модели заранее; ошибки не фатальны - шаг повторится при первом использовании."""
+    global _metrics
+    for name in steps:
+        start = time.perf_counter()
+        try:
+            STEPS[name]()
+            record(f"warmup.{name}_ms", (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            print(f"Warm-up {name} failed: {e}")
+            record(f"warmup.{name}_ms", f"{type(e).__name__}: {e}")
+
+    try:
+        from modules.metrics import get_metrics
+        with _timings_lock:
+            _metrics = get_metrics()
+            recorded = dict(timings)
+        for name, value in recorded.items():
+            if isinstance(value, float):
+                _metrics.observe(f"startup.{name}", value)
+    except Exception as e:
+        print(f"Warm-up metrics failed: {e}")
+    return dict(timings)
+
+
+def start_warmup(steps: Iterable[str] = WARMUP_STEPS) -> threading.Thread:
+    thread = threading.Thread(target=warm_up, args=(tuple(steps),), name="warmup", daemon=True)
+    thread.start()
+    return thread
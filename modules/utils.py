@@ -1,21 +1,85 @@
 import json
 import os
-from typing import List, Dict
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, Optional
 
-LOG_FILE = "interview_log.json"
+LOG_DIR = os.getenv("INTERVIEW_LOG_DIR", "logs")
+LOG_FSYNC = os.getenv("INTERVIEW_LOG_FSYNC", "1") == "1"
 
-def save_log(participant_name: str, turns: List[Dict], final_feedback: str = ""):
-    """Сохраняет данные сессии в JSON."""
-    data = {
+_log_lock = threading.Lock()
+
+
+def new_session_id() -> str:
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def log_path(session_id: str, log_dir: Optional[str] = None) -> str:
+    return os.path.join(log_dir or LOG_DIR, f"{session_id}.jsonl")
+
+
+def append_record(session_id: str, record: Dict, fsync: bool = LOG_FSYNC, log_dir: Optional[str] = None):
+    """Дописывает одну запись в JSONL-лог сессии.
+
+    Запись - одна строка, выполняемая одним write; при fsync=True данные
+    сбрасываются на диск до возврата, так что падение не теряет прошлые ходы.
+    """
+    os.makedirs(log_dir or LOG_DIR, exist_ok=True)
+    line = json.dumps({"ts": time.time(), **record}, ensure_ascii=False, default=str) + "\n"
+    with _log_lock, open(log_path(session_id, log_dir), "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+def log_session_start(session_id: str, participant_name: str, position: str, grade: str,
+                      log_dir: Optional[str] = None, **extra):
+    append_record(session_id, {
+        "type": "session",
+        "session_id": session_id,
         "participant_name": participant_name,
-        "turns": turns,
-        "final_feedback": final_feedback
+        "position": position,
+        "grade": grade,
+        **extra
+    }, log_dir=log_dir)
+
+
+def turn_record(prev_state: Dict, new_state: Dict) -> Dict:
+    """Запись лога для хода, завершенного переходом prev_state -> new_state."""
+    return {
+        "question_number": new_state.get('current_question_number', 0),
+        "turn": new_state['turns'][-1],
+        "scores": new_state.get('turn_scores', [])[len(prev_state.get('turn_scores', [])):],
+        "difficulty": new_state.get('current_difficulty'),
+        "vision_context": new_state.get('vision_context')
     }
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def load_log():
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
\ No newline at end of file
+
+
+def log_turn(session_id: str, turn: Dict, log_dir: Optional[str] = None):
+    append_record(session_id, {"type": "turn", **turn}, log_dir=log_dir)
+
+
+def save_log(session_id: str, final_feedback: str = "", final_report: Optional[Dict] = None,
+             log_dir: Optional[str] = None):
+    """Сохраняет итог сессии отдельной записью в ее лог."""
+    append_record(session_id, {
+        "type": "final",
+        "final_feedback": final_feedback,
+        "final_report": final_report or {}
+    }, log_dir=log_dir)
+
+
+def load_log(session_id: str, log_dir: Optional[str] = None) -> Iterator[Dict]:
+    """Построчно читает записи лога сессии; недописанная последняя строка пропускается."""
+    path = log_path(session_id, log_dir)
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
@@ -1,35 +1,401 @@
-from ultralytics import YOLO
 import numpy as np
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from PIL import Image
+
+from modules.metrics import get_metrics, span
+
+WATCHED_CLASSES = ("person", "cell phone", "book", "laptop")
+
+
+@dataclass
+class VisionProfile:
+    """Параметры инференса YOLO для CPU-хостов без GPU.
+
+    model_path может указывать на экспортированную модель, например
+    `yolo export model=yolov8n.pt format=onnx imgsz=320 dynamic=True`
+    (dynamic нужен для батчей; для ONNX требуется onnxruntime).
+    """
+    model_path: str = "yolov8n.pt"
+    classes: Tuple[str, ...] = WATCHED_CLASSES
+    imgsz: int = 320
+    conf: float = 0.35
+    threads: int = 0
+    device: str = "cpu"
+    warmup: bool = True
+
+    @classmethod
+    def from_env(cls) -> "VisionProfile":
+        return cls(
+            model_path=os.getenv("VISION_MODEL", cls.model_path),
+            imgsz=int(os.getenv("VISION_IMGSZ", cls.imgsz)),
+            conf=float(os.getenv("VISION_CONF", cls.conf)),
+            threads=int(os.getenv("VISION_THREADS", cls.threads)),
+            device=os.getenv("VISION_DEVICE", cls.device),
+            warmup=os.getenv("VISION_WARMUP", "1") == "1"
+        )
+
+
+class VisionService:
+    """Один экземпляр YOLO на процесс, общий для всех сессий.
+
+    Кадры из разных сессий собираются в мини-батчи (до max_batch кадров или
+    max_wait_ms ожидания) и прогоняются через модель одним вызовом.
+    """
+
+    def __init__(self, profile: Optional[VisionProfile] = None, max_batch: int = 8, max_wait_ms: float = 20.0):
+        self.profile = profile or VisionProfile.from_env()
+        if self.profile.threads > 0:
+            import torch
+            torch.set_num_threads(self.profile.threads)
+
+        from ultralytics import YOLO
+
+        print(f"Загрузка модели YOLOv8 ({self.profile.model_path})...")
+        self.model = YOLO(self.profile.model_path, task="detect")
+        self.names = self.model.names
+        self.class_ids = [i for i, name in self.names.items() if name in self.profile.classes]
+        if self.profile.warmup:
+            self.predict([np.zeros((self.profile.imgsz, self.profile.imgsz, 3), dtype=np.uint8)])
+
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.frames = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def predict(self, frames: List[np.ndarray]):
+        return self.model.predict(
+            frames,
+            imgsz=self.profile.imgsz,
+            conf=self.profile.conf,
+            classes=self.class_ids or None,
+            device=self.profile.device,
+            verbose=False
+        )
+
+    def detect(self, frame_np: np.ndarray, timeout: Optional[float] = None) -> List[Tuple[str, float]]:
+        future = Future()
+        self._queue.put((frame_np, future))
+        return future.result(timeout=timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                with span("vision.inference"):
+                    results = self.predict([frame for frame, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(batch)
+            get_metrics().observe("vision.batch_size", len(batch))
+            for (_, future), r in zip(batch, results):
+                future.set_result([
+                    (self.names[int(c)], float(p)) for c, p in zip(r.boxes.cls, r.boxes.conf)
+                ])
+
+
+_service: Optional[VisionService] = None
+_service_lock = threading.Lock()
+
+
+def get_vision_service() -> VisionService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = VisionService()
+        return _service
+
+
+def describe_objects(labels: List[str]) -> str:
+    unique_objects = set(labels)
+
+    context = []
+    if 'cell phone' in unique_objects:
+        context.append("ALERT: Candidate is holding a phone!")
+    if 'person' not in unique_objects:
+        context.append("ALERT: Candidate is NOT visible.")
+    if 'book' in unique_objects or 'laptop' in unique_objects:
+        context.append("Note: Books/Laptop visible nearby.")
+
+    if not context:
+        return "Candidate is present. No suspicious objects detected."
+
+    return " | ".join(context)
+
 
 class VisionSystem:
-    def __init__(self):
-        print("Загрузка модели YOLOv8...")
-        self.model = YOLO('yolov8n.pt') 
+    def __init__(self, service: Optional[VisionService] = None):
+        self.service = service or get_vision_service()
+
+    def detect(self, frame_np) -> List[Tuple[str, float]]:
+        return self.service.detect(frame_np)
 
     def analyze_frame(self, frame_np):
         if frame_np is None:
             return "Camera feed unavailable."
 
-        results = self.model(frame_np, verbose=False)
-        detected_objects = []
-        
-        for r in results:
-            for box in r.boxes:
-                cls_id = int(box.cls[0])
-                label = self.model.names[cls_id]
-                detected_objects.append(label)
-
-        unique_objects = set(detected_objects)
-        
-        context = []
-        if 'cell phone' in unique_objects:
-            context.append("ALERT: Candidate is holding a phone!")
-        if 'person' not in unique_objects:
-            context.append("ALERT: Candidate is NOT visible.")
-        if 'book' in unique_objects or 'laptop' in unique_objects:
-             context.append("Note: Books/Laptop visible nearby.")
-        
-        if not context:
-            return "Candidate is present. No suspicious objects detected."
-        
-        return " | ".join(context)
\ No newline at end of file
+        detected_objects = self.detect(frame_np)
+        return describe_objects([label for label, _ in detected_objects])
+
+
+class DetectionTracker:
+    """Скользящее окно детекций одной сессии.
+
+    Хранит кольцевой буфер (время, число объектов и макс. уверенность по классам)
+    и поднимает тревогу, если класс встретился хотя бы в min_hits кадрах
+    за window_s секунд - одиночные ложные срабатывания отсекаются. Одного
+    кадра (например, ручного снимка) хватает только при уверенной детекции
+    (max_conf >= confident). Повтор кадра с тем же frame_key не считается
+    новым кадром, а лишь обновляет время последнего.
+    """
+
+    def __init__(self, window_s: float = 60.0, maxlen: int = 64, min_hits: int = 2,
+                 confident: float = 0.6):
+        self.window_s = window_s
+        self.min_hits = min_hits
+        self.confident = confident
+        self._frames = deque(maxlen=maxlen)
+        self._last_key = None
+        self._lock = threading.Lock()
+
+    def update(self, detections: List[Tuple[str, float]], ts: Optional[float] = None,
+               frame_key: Optional[str] = None):
+        counts: Dict[str, int] = {}
+        confs: Dict[str, float] = {}
+        for label, conf in detections:
+            counts[label] = counts.get(label, 0) + 1
+            confs[label] = max(confs.get(label, 0.0), conf)
+
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if frame_key is not None and frame_key == self._last_key and self._frames:
+                self._frames[-1] = (ts, self._frames[-1][1], self._frames[-1][2])
+                return
+            self._last_key = frame_key
+            self._frames.append((ts, counts, confs))
+
+    def _confirmed(self, hits: int, max_conf: float = 0.0) -> bool:
+        return hits >= self.min_hits or (hits > 0 and max_conf >= self.confident)
+
+    def summary(self, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            frames = [f for f in self._frames if now - f[0] <= self.window_s]
+
+        n = len(frames)
+        classes = {}
+        for name in WATCHED_CLASSES:
+            hits = [f for f in frames if name in f[1]]
+            classes[name] = {
+                "hits": len(hits),
+                "ratio": round(len(hits) / n, 2) if n else 0.0,
+                "max_conf": round(max((f[2][name] for f in hits), default=0.0), 2)
+            }
+
+        alerts = []
+        text = []
+        phone = classes["cell phone"]
+        if self._confirmed(phone["hits"], phone["max_conf"]):
+            alerts.append("phone")
+            text.append(f"ALERT: Candidate is holding a phone! ({classes['cell phone']['hits']}/{n} frames)")
+        misses = n - classes["person"]["hits"]
+        if self._confirmed(misses) and classes["person"]["ratio"] < 0.5:
+            alerts.append("absent")
+            text.append(f"ALERT: Candidate is NOT visible. ({misses}/{n} frames)")
+        materials = [classes["book"], classes["laptop"]]
+        if self._confirmed(sum(c["hits"] for c in materials), max(c["max_conf"] for c in materials)):
+            alerts.append("materials")
+            text.append("Note: Books/Laptop visible nearby.")
+
+        if not n:
+            summary_text = "No camera data yet."
+        elif not text:
+            summary_text = "Candidate is present. No suspicious objects detected."
+        else:
+            summary_text = " | ".join(text)
+
+        return {
+            "frames": n,
+            "window_s": self.window_s,
+            "classes": classes,
+            "alerts": alerts,
+            "text": summary_text
+        }
+
+
+class VisionWorker:
+    """Фоновый анализ снимков: YOLO не блокирует перезапуск скрипта Streamlit.
+
+    Детекции кэшируются по хэшу кадра, а почти не изменившиеся кадры
+    (средняя разница уменьшенных копий ниже motion_threshold) не прогоняются
+    через модель повторно. Каждый новый кадр попадает в DetectionTracker сессии.
+    Поток запускается с первым кадром и завершается после idle_s секунд без
+    кадров, поэтому брошенные сессии не держат потоки до конца процесса.
+    """
+
+    def __init__(self, vision: VisionSystem, cache_size: int = 32, motion_threshold: float = 6.0,
+                 tracker: Optional[DetectionTracker] = None, idle_s: float = 30.0):
+        self.vision = vision
+        self.idle_s = idle_s
+        self.tracker = tracker or DetectionTracker()
+        self.cache_size = cache_size
+        self.motion_threshold = motion_threshold
+        self.latest: Optional[Dict] = None
+        self.inferences = 0
+        self.skipped = 0
+
+        self._cache = OrderedDict()
+        self._pending = None
+        self._cond = threading.Condition()
+        self._queue = queue.Queue(maxsize=1)
+        self._ref_thumb = None
+        self._ref_result = None
+        self._ref_key = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def frame_key(frame: Union[bytes, np.ndarray]) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        if isinstance(frame, np.ndarray):
+            h.update(str(frame.shape).encode())
+            h.update(np.ascontiguousarray(frame).data)
+        else:
+            h.update(frame)
+        return h.hexdigest()
+
+    @staticmethod
+    def thumbnail(frame: np.ndarray, size: int = 32) -> np.ndarray:
+        step_y = max(1, frame.shape[0] // size)
+        step_x = max(1, frame.shape[1] // size)
+        small = frame[::step_y, ::step_x].astype(np.float32)
+        return small.mean(axis=2) if small.ndim == 3 else small
+
+    def submit(self, frame: Union[bytes, np.ndarray], timeout: float = 0.0) -> Optional[Dict]:
+        """Ставит кадр (ndarray или байты изображения) в очередь.
+
+        Возвращает сводку трекера, если кадр уже проанализирован, иначе None.
+        Необработанный предыдущий кадр вытесняется - важен только последний.
+        """
+        key = self.frame_key(frame)
+        with self._cond:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.latest = self.tracker.summary()
+                return self.latest
+            in_flight = key == self._pending
+            self._pending = key
+
+        if not in_flight:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put((key, frame))
+            self._ensure_thread()
+
+        if timeout > 0:
+            with self._cond:
+                if self._cond.wait_for(lambda: key in self._cache, timeout=timeout):
+                    self.latest = self.tracker.summary()
+                    return self.latest
+        return None
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vision-worker", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Останавливает поток; необработанный кадр отбрасывается."""
+        with self._thread_lock:
+            if self._thread is None:
+                return
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put((None, None))
+
+    def _run(self):
+        while True:
+            try:
+                key, frame = self._queue.get(timeout=self.idle_s)
+            except queue.Empty:
+                key = None
+            if key is None:
+                with self._thread_lock:
+                    # Кадр мог прийти, пока решали завершиться - тогда продолжаем
+                    if not self._queue.empty():
+                        continue
+                    self._thread = None
+                    with self._cond:
+                        self._pending = None
+                return
+            try:
+                detections, track_key = self._analyze(frame, key)
+            except Exception as e:
+                print(f"Vision worker error: {e}")
+                with self._cond:
+                    self._pending = None
+                continue
+            # Кадр, пропущенный гейтингом движения, - та же улика, что и опорный кадр
+            self.tracker.update(detections, frame_key=track_key)
+
+            with self._cond:
+                self._cache[key] = detections
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self._cond.notify_all()
+
+    def _analyze(self, frame: Union[bytes, np.ndarray], key: str) -> Tuple[List[Tuple[str, float]], str]:
+        """Детекции кадра и ключ для трекера: у почти не изменившегося кадра - ключ опорного."""
+        if isinstance(frame, (bytes, bytearray)):
+            frame = np.array(Image.open(io.BytesIO(frame)).convert("RGB"))
+
+        thumb = self.thumbnail(frame)
+        if (
+            self._ref_thumb is not None
+            and self._ref_thumb.shape == thumb.shape
+            and float(np.abs(thumb - self._ref_thumb).mean()) < self.motion_threshold
+        ):
+            self.skipped += 1
+            return self._ref_result, self._ref_key
+
+        result = self.vision.detect(frame)
+        self.inferences += 1
+        self._ref_thumb = thumb
+        self._ref_result = result
+        self._ref_key = key
+        return result, key
@@ -1,23 +1,62 @@
-import streamlit as st
-import numpy as np
-from PIL import Image
 import time
+SCRIPT_START = time.perf_counter()
+
+import streamlit as st
 from datetime import datetime, timedelta
-from modules.graph import build_graph
-from modules.vision import VisionSystem
-from modules.audio import AudioSystem
-from modules.utils import save_log
+from modules import startup
+from modules.utils import new_session_id, log_path, log_session_start, log_turn, save_log, turn_record
 import warnings
 warnings.filterwarnings("ignore", message=".*NNPACK.*")
 
 st.set_page_config(page_title="AI Interview Coach (Local)", layout="wide")
 
-if 'vision' not in st.session_state:
-    st.session_state.vision = VisionSystem()
-if 'audio' not in st.session_state:
-    st.session_state.audio = AudioSystem()
-if 'graph' not in st.session_state:
-    st.session_state.graph = build_graph()
+
+# Тяжелые модули (langchain, langgraph, ultralytics/torch, распознавание речи)
+# импортируются только здесь: при первом использовании или в фоновом прогреве.
+@st.cache_resource(show_spinner=False)
+def warmup_thread():
+    return startup.start_warmup()
+
+
+@st.cache_resource(show_spinner="Загрузка модели интервьюера...")
+def load_graph():
+    from modules.graph import build_graph, get_checkpointer
+    return build_graph(get_checkpointer())
+
+
+@st.cache_resource(show_spinner="Загрузка YOLO...")
+def load_vision():
+    from modules.vision import VisionSystem
+    return VisionSystem()
+
+
+@st.cache_resource(show_spinner="Загрузка аудио...")
+def load_audio_backends():
+    # Общие на процесс только движки без состояния сессии: TTS, ASR и кэш TTS
+    from modules.audio import get_speech_recognizer, get_tts_backend, get_tts_cache
+    get_tts_backend()
+    get_speech_recognizer()
+    get_tts_cache()
+
+
+def load_audio():
+    """AudioSystem на сессию: поток микрофона и его блокировка у каждой сессии свои."""
+    if 'audio' not in st.session_state:
+        load_audio_backends()
+        from modules.audio import AudioSystem
+        st.session_state.audio = AudioSystem()
+    return st.session_state.audio
+
+
+def vision_worker():
+    if 'vision_worker' not in st.session_state:
+        from modules.vision import VisionWorker
+        st.session_state.vision_worker = VisionWorker(load_vision())
+    return st.session_state.vision_worker
+
+
+warmup_thread()
+
 if 'history' not in st.session_state:
     st.session_state.history = []
 if 'use_tts' not in st.session_state:
@@ -33,6 +72,75 @@ if 'question_skipped' not in st.session_state:
 if 'pending_input' not in st.session_state:
     st.session_state.pending_input = None
 
+
+def history_from_turns(turns):
+    """Восстанавливает ленту чата из ходов сохраненной сессии."""
+    history = []
+    for turn in turns:
+        if turn.get('user_message'):
+            history.append({"role": "user", "content": turn['user_message'], "id": len(history)})
+        if turn.get('agent_visible_message'):
+            history.append({"role": "ai", "content": turn['agent_visible_message'], "id": len(history)})
+    return history
+
+
+def turn_input(user_input):
+    """Вход очередного хода: остальное состояние граф берет из чекпоинта сессии."""
+    return {
+        "last_user_input": user_input,
+        "vision_context": st.session_state.graph_state.get('vision_context', "Camera active")
+    }
+
+
+def run_graph(inputs, container):
+    """Прогоняет граф, показывая вопрос интервьюера и отчет по мере генерации токенов."""
+    buffers = {"interviewer": "", "feedback": ""}
+    slots = {}
+    from modules.graph import stream_turn, thread_config
+
+    state = st.session_state.get('graph_state') or {}
+    final_state = {**state, **inputs}
+    config = thread_config(st.session_state.session_id)
+    with container:
+        for kind, node, payload in stream_turn(load_graph(), inputs, config):
+            if kind == "state":
+                final_state = payload
+                continue
+            if kind == "message":
+                if st.session_state.use_tts:
+                    load_audio().presynthesize(payload)
+                continue
+            buffers[node] += payload
+            if node not in slots:
+                slots[node] = st.chat_message("ai").empty() if node == "interviewer" else st.empty()
+            slots[node].markdown(buffers[node] + "▌")
+    record_turn(state, final_state)
+    return final_state
+
+
+def record_turn(prev_state, new_state):
+    """Дописывает в лог сессии ход, завершенный последним прогоном графа."""
+    session_id = st.session_state.get('session_id')
+    if not session_id:
+        return
+    if new_state.get('turns'):
+        log_turn(session_id, turn_record(prev_state, new_state))
+    if new_state.get('final_feedback') and not prev_state.get('final_feedback'):
+        save_log(session_id, new_state['final_feedback'], new_state.get('final_report'))
+
+
+session_param = st.query_params.get("session")
+if 'graph_state' not in st.session_state and session_param:
+    from modules.graph import resume_state
+    restored = resume_state(load_graph(), session_param)
+    if restored:
+        st.session_state.session_id = session_param
+        st.session_state.graph_state = restored
+        st.session_state.history = history_from_turns(restored.get('turns', []))
+        st.session_state.answer_start_time = datetime.now()
+
+live_area = st.container()
+
 with st.sidebar:
     st.header("Настройки кандидата")
     name = st.text_input("Имя", "Всеволод")
@@ -48,35 +156,35 @@ with st.sidebar:
     
     if st.button("Проверить звук"):
         st.info("Проверка звука...")
-        st.session_state.audio.play_audio_streamlit(
+        load_audio().play_audio_streamlit(
             "Проверка звука. Если вы слышите это сообщение, звук работает корректно."
         )
     
     if st.button("Начать собеседование", type="primary"):
+        if st.session_state.get('capture'):
+            st.session_state.capture.stop()
+            st.session_state.capture = None
+        if st.session_state.get('vision_worker'):
+            st.session_state.vision_worker.stop()
+            del st.session_state.vision_worker
+        if st.session_state.get('audio'):
+            st.session_state.audio.close()
         st.session_state.history = []
         st.session_state.recording = False
         st.session_state.answer_start_time = None
         st.session_state.question_skipped = False
         st.session_state.pending_input = None
-        st.session_state.graph_state = {
-            "participant_name": name,
-            "position": position,
-            "grade": grade,
-            "history": [],
-            "turns": [],
-            "current_difficulty": 5,
-            "last_user_input": "",
-            "vision_context": "Camera active",
-            "observer_instruction": "",
-            "all_observer_thoughts": [],
-            "final_feedback": "",
-            "conversation_active": True,
-            "total_questions": st.session_state.get('total_questions', 10),
-            "current_question_number": 0
-        }
+        st.session_state.session_id = new_session_id()
+        st.query_params["session"] = st.session_state.session_id
+        log_session_start(st.session_state.session_id, name, position, grade,
+                          total_questions=st.session_state.get('total_questions', 10))
+        from modules.graph import initial_state
+        st.session_state.graph_state = initial_state(
+            name, position, grade, total_questions=st.session_state.get('total_questions', 10)
+        )
         
         with st.spinner("Запуск собеседования..."):
-            initial = st.session_state.graph.invoke(st.session_state.graph_state)
+            initial = run_graph(st.session_state.graph_state, live_area)
             st.session_state.graph_state = initial
             st.session_state.answer_start_time = datetime.now()
             
@@ -117,6 +225,7 @@ if 'graph_state' not in st.session_state:
         - **2 мин** — общий таймер на ответ, после истечения вопрос пропускается
         """)
     
+    startup.record("first_render_ms", (time.perf_counter() - SCRIPT_START) * 1000)
     st.stop()
 
 with st.expander("Vision Monitoring", expanded=True):
@@ -127,10 +236,12 @@ with st.expander("Vision Monitoring", expanded=True):
     vision_status = "Ожидание снимка..."
     if img_file:
         try:
-            image = Image.open(img_file)
-            frame = np.array(image)
-            vision_status = st.session_state.vision.analyze_frame(frame)
-            st.session_state.graph_state['vision_context'] = vision_status
+            summary = vision_worker().submit(img_file.getvalue())
+            if summary is None:
+                vision_status = "Анализ снимка..."
+            else:
+                vision_status = summary["text"]
+                st.session_state.graph_state['vision_context'] = summary
         except Exception as e:
             vision_status = f"Ошибка камеры: {str(e)}"
             st.session_state.graph_state['vision_context'] = "Camera error"
@@ -148,7 +259,7 @@ with chat_container:
             st.write(msg["content"])
             if msg["role"] == "ai" and msg["content"]:
                 if st.button("Воспроизвести", key=f"audio_btn_{i}"):
-                    st.session_state.audio.play_audio_streamlit(msg["content"])
+                    load_audio().play_audio_streamlit(msg["content"])
 
 st.divider()
 st.subheader("Время на ответ")
@@ -212,22 +323,32 @@ with col_help:
         """)
 
 if st.session_state.recording and st.session_state.graph_state.get('conversation_active'):
-    if not st.session_state.question_skipped:
+    capture = st.session_state.get('capture')
+    if capture is None:
+        capture = load_audio().start_capture(max_duration_s=45)
+        st.session_state.capture = capture
+
+    if capture.active and not st.session_state.question_skipped:
+        from streamlit_autorefresh import st_autorefresh
+        st_autorefresh(interval=1000, key="capture_refresh")
         st.warning("Идет запись... Говорите ваш ответ (до 45 сек)")
-        
+        if capture.transcript:
+            st.caption(f"Распознано: {capture.transcript}")
+        if st.button("Закончить ответ", key="stop_capture"):
+            capture.stop()
+            st.rerun()
+    else:
         with st.spinner("Распознавание речи..."):
-            text = st.session_state.audio.listen_from_mic(timeout=5, phrase_time_limit=45)
-            
-            if text:
-                st.session_state.pending_input = text
-                st.session_state.recording = False
-                st.success(f"Распознано: {text}")
-                time.sleep(1)
-                st.rerun()
-            else:
-                st.session_state.recording = False
-                st.warning("Речь не распознана. Попробуйте еще раз или введите текст.")
-                st.rerun()
+            text = capture.finish()
+        st.session_state.capture = None
+        st.session_state.recording = False
+        if text:
+            st.session_state.pending_input = text
+            st.success(f"Распознано: {text}")
+            time.sleep(1)
+        else:
+            st.warning("Речь не распознана. Попробуйте еще раз или введите текст.")
+        st.rerun()
 
 input_val = None
 if st.session_state.pending_input:
@@ -242,10 +363,8 @@ if input_val and st.session_state.graph_state.get('conversation_active'):
         "content": input_val,
         "id": len(st.session_state.history)
     })
-    st.session_state.graph_state['last_user_input'] = input_val
-    
     with st.spinner("Интервьюер анализирует ответ..."):
-        new_state = st.session_state.graph.invoke(st.session_state.graph_state)
+        new_state = run_graph(turn_input(input_val), st.container())
         st.session_state.graph_state = new_state
         st.session_state.answer_start_time = datetime.now()
         st.session_state.question_skipped = False
@@ -256,7 +375,6 @@ if input_val and st.session_state.graph_state.get('conversation_active'):
                 "content": "Интервью окончено. Формирую итоговый отчет...",
                 "id": len(st.session_state.history)
             })
-            save_log(name, new_state['turns'], new_state['final_feedback'])
         else:
             if new_state['turns']:
                 ai_msg = new_state['turns'][-1].get('agent_visible_message', '')
@@ -269,7 +387,7 @@ if input_val and st.session_state.graph_state.get('conversation_active'):
                     })
                     if st.session_state.use_tts:
                         st.info("Воспроизведение следующего вопроса...")
-                        st.session_state.audio.play_audio_streamlit(ai_msg)
+                        load_audio().play_audio_streamlit(ai_msg)
     
     st.rerun()
 
@@ -284,10 +402,7 @@ if st.session_state.get('answer_start_time') and st.session_state.graph_state.ge
         })
         
         with st.spinner("Переход к следующему вопросу..."):
-            new_state = st.session_state.graph.invoke({
-                **st.session_state.graph_state,
-                'last_user_input': '[SKIPPED - Timeout]',
-            })
+            new_state = run_graph(turn_input('[SKIPPED - Timeout]'), st.container())
             st.session_state.graph_state = new_state
             st.session_state.answer_start_time = datetime.now()
             
@@ -301,7 +416,7 @@ if st.session_state.get('answer_start_time') and st.session_state.graph_state.ge
                     })
                     
                     if st.session_state.use_tts:
-                        st.session_state.audio.play_audio_streamlit(ai_msg)
+                        load_audio().play_audio_streamlit(ai_msg)
         
         st.rerun()
 
@@ -314,20 +429,21 @@ if st.session_state.graph_state.get('final_feedback'):
     
     with col_audio:
         if st.button("Озвучить полный отчет"):
-            st.session_state.audio.play_audio_streamlit(
+            load_audio().play_long_text_streamlit(
                 st.session_state.graph_state['final_feedback']
             )
     
     with col_download:
         try:
-            with open("interview_log.json", "rb") as f:
+            session_id = st.session_state.session_id
+            with open(log_path(session_id), "rb") as f:
                 st.download_button(
                     "Скачать лог", 
                     f, 
-                    "interview_log.json",
-                    help="Скачать полный лог собеседования в формате JSON"
+                    f"interview_log_{session_id}.jsonl",
+                    help="Скачать лог этой сессии в формате JSON Lines (одна запись на ход)"
                 )
-        except:
+        except Exception:
             st.warning("Лог собеседования не найден")
 
 if st.session_state.graph_state.get('turns'):
@@ -350,4 +466,46 @@ with st.sidebar:
             st.session_state.use_tts = True
             st.rerun()
     
-    st.caption(f"{'Озвучка: ВКЛ' if st.session_state.use_tts else 'Озвучка: ВЫКЛ'}")
\ No newline at end of file
+    st.caption(f"{'Озвучка: ВКЛ' if st.session_state.use_tts else 'Озвучка: ВЫКЛ'}")
+with st.sidebar:
+    from modules.cache import get_response_cache
+    from modules.metrics import export_json, get_metrics
+
+    st.markdown("---")
+    with st.expander("⏱️ Метрики"):
+        snapshot = get_metrics().snapshot()
+        if snapshot:
+            st.dataframe(
+                [{"метрика": name, **values} for name, values in snapshot.items()],
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("Пока нет данных")
+
+        turns = st.session_state.graph_state.get('turns') or [{}]
+        last_metrics = turns[-1].get('metrics')
+        if last_metrics:
+            st.caption(
+                f"Последний ход: {last_metrics['total_ms']:.0f} мс, "
+                f"токены {last_metrics['prompt_tokens']}/{last_metrics['completion_tokens']}, "
+                f"${last_metrics['cost_usd']:.4f}"
+            )
+        if startup.timings:
+            st.caption("Холодный старт: " + ", ".join(
+                f"{name} {value:.0f} мс" if isinstance(value, float) else f"{name}: {value}"
+                for name, value in startup.timings.items()
+            ))
+
+        cache = get_response_cache()
+        st.download_button(
+            "Экспорт метрик (JSON)",
+            export_json({
+                "session_id": st.session_state.get('session_id'),
+                "llm_cache": cache.stats() if cache else None,
+                "startup": dict(startup.timings),
+                "last_turn": last_metrics
+            }),
+            "metrics.json",
+            mime="application/json"
+        )